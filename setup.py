@@ -38,5 +38,5 @@ setuptools.setup(
         "Operating System :: Linux"
     ],
     license=open("COPYING").read(),
-    python_requires='>=3.7.3',
+    python_requires='>=3.8',
 )
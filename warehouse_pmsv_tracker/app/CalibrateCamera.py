@@ -0,0 +1,99 @@
+#
+# Copyright (c) 2021. Niels Post. AI Lab Vrije Universiteit Brussel.
+#
+# This file is part of MP-Firm.
+#
+# MP-Firm is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MP-Firm is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MP-Firm.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+"""
+    Calibrate a camera, and write a calibration file that CameraUndistortion can load.
+
+    Print a calibration pattern first (--print-pattern), and fix it to something flat. Then start the calibration and
+    move the pattern through the camera view: near and far, tilted in different directions, and into the corners of the
+    image. A view is captured every --interval seconds, until the pattern was found in --views of them.
+
+    ChArUco boards are recommended, since they don't need to be completely visible and therefore also calibrate the
+    edges of the image well. The reprojection error is printed at the end, a good calibration is below 0.5 pixels.
+
+    Example: python -m warehouse_pmsv_tracker.app.CalibrateCamera --camera 0 --pattern charuco --columns 8 --rows 6 \\
+        --square-size 25 --marker-size 18 --output resources/new_camera_calibration.yaml
+"""
+import argparse
+
+import cv2
+
+from warehouse_pmsv_tracker.detection.calibration import CameraCalibrator, ChessboardPattern, CharucoPattern
+from warehouse_pmsv_tracker.detection.capture import ReplayCapture, VideoCaptureSource
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate a camera")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--camera", type=int, help="Index of the camera to calibrate")
+    source.add_argument("--recording", help="Recording (see FrameRecorder) to take views from")
+    source.add_argument("--images", nargs="+", help="Images to use as views")
+    source.add_argument("--print-pattern", metavar="FILE", help="Only write an image of the pattern for printing")
+    parser.add_argument("--output", help="File to write the calibration to")
+    parser.add_argument("--pattern", choices=["charuco", "chessboard"], default="charuco", help="Calibration pattern")
+    parser.add_argument("--columns", type=int, default=8,
+                        help="Squares in horizontal direction (inner corners for a chessboard)")
+    parser.add_argument("--rows", type=int, default=6,
+                        help="Squares in vertical direction (inner corners for a chessboard)")
+    parser.add_argument("--square-size", type=float, default=25., help="Size of a square in millimeters")
+    parser.add_argument("--marker-size", type=float, default=18., help="Size of a ChArUco marker in millimeters")
+    parser.add_argument("--views", type=int, default=30, help="Amount of views the pattern should be found in")
+    parser.add_argument("--interval", type=float, default=1., help="Minimum amount of seconds between two views")
+    parser.add_argument("--workers", type=int, default=None, help="Amount of corner extraction processes")
+    parser.add_argument("--no-flip", action="store_true",
+                        help="Don't flip views, for use with CameraUndistortion(flip_image=False)")
+    arguments = parser.parse_args()
+
+    if arguments.pattern == "charuco":
+        pattern = CharucoPattern(arguments.columns, arguments.rows, arguments.square_size, arguments.marker_size)
+    else:
+        pattern = ChessboardPattern(arguments.columns, arguments.rows, arguments.square_size)
+
+    if arguments.print_pattern is not None:
+        cv2.imwrite(arguments.print_pattern, pattern.draw(2000))
+        return
+    if arguments.output is None:
+        parser.error("--output is required for a calibration")
+
+    calibrator = CameraCalibrator(pattern, not arguments.no_flip, arguments.workers)
+    try:
+        if arguments.images is not None:
+            for image_file in arguments.images:
+                calibrator.add_view(cv2.imread(image_file))
+        else:
+            if arguments.recording is not None:
+                frame_source = ReplayCapture(arguments.recording)
+            else:
+                frame_source = VideoCaptureSource(cv2.VideoCapture(arguments.camera))
+            calibrator.capture_views(frame_source, arguments.views, arguments.interval, verbose=True)
+            frame_source.release()
+
+        result = calibrator.calibrate()
+    finally:
+        calibrator.release()
+
+    result.save(arguments.output)
+    print("calibrated %ix%i camera from %i views, reprojection error %.3f pixels (worst view %.3f)"
+          % (*result.image_size, len(result.view_errors), result.reprojection_error, result.view_errors.max()))
+    print("wrote calibration to %s" % arguments.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+#
+# Copyright (c) 2021. Niels Post. AI Lab Vrije Universiteit Brussel.
+#
+# This file is part of MP-Firm.
+#
+# MP-Firm is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MP-Firm is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MP-Firm.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+"""
+    Create a marker dictionary containing only the marker IDs that are deployed, and print the markers from it.
+
+    Detecting from a dictionary of ~25 markers instead of the 1024 in the original Aruco dictionary makes decoding
+    faster, allows more bit errors to be corrected and prevents false detections of IDs that are not in use. The
+    dictionary can be loaded using Aruco(dictionary_file=...), or by setting aruco_dictionary_file in PMSVInterface.
+
+    Note that markers printed from the original dictionary are not recognized by the new dictionary, so all markers
+    need to be reprinted.
+
+    Example: python -m warehouse_pmsv_tracker.app.GenerateMarkerDictionary --corners 0,1,4,5 --robots 2,3,6-24 \\
+        --output resources/marker_dictionary.yaml --print-directory resources/aruco_markers
+"""
+import argparse
+import os
+from typing import List
+
+from warehouse_pmsv_tracker.detection.aruco import Aruco, MarkerDictionary
+
+
+def _parse_ids(text: str) -> List[int]:
+    """
+    Parse a list of IDs and ID ranges, like "0,1,4-8"
+    """
+    ids = []
+    for part in filter(None, text.split(",")):
+        start, _, end = part.partition("-")
+        ids.extend(range(int(start), int(end or start) + 1))
+    return ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create a marker dictionary for the deployed markers")
+    parser.add_argument("--corners", type=_parse_ids, default=[0, 1, 4, 5], help="IDs of the test area corner markers")
+    parser.add_argument("--robots", type=_parse_ids, required=True, help="IDs of the robot markers, like 2,3,6-24")
+    parser.add_argument("--output", required=True, help="File to write the dictionary to")
+    parser.add_argument("--marker-bits", type=int, default=4, help="Size of the marker grid in bits")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the marker generation")
+    parser.add_argument("--print-directory", default=None,
+                        help="When given, printable markers are written to the big and small subdirectories")
+    arguments = parser.parse_args()
+
+    overlap = set(arguments.corners) & set(arguments.robots)
+    if overlap:
+        parser.error("IDs %s are used both as corner and as robot marker" % sorted(overlap))
+
+    marker_dictionary = MarkerDictionary.create(arguments.corners + arguments.robots, arguments.marker_bits,
+                                                arguments.seed)
+    marker_dictionary.save(arguments.output)
+    print("wrote %i markers (%ix%i bits, corrects %i bits) to %s"
+          % (len(marker_dictionary), arguments.marker_bits, arguments.marker_bits,
+             marker_dictionary.dictionary.maxCorrectionBits, arguments.output))
+
+    if arguments.print_directory is not None:
+        for subdirectory in ("big", "small"):
+            os.makedirs(os.path.join(arguments.print_directory, subdirectory), exist_ok=True)
+        # Corner markers are printed big, robot markers small
+        Aruco.generate_marker_pairs(len(arguments.corners), os.path.join(arguments.print_directory, "big"),
+                                    dictionary_file=arguments.output, marker_ids=sorted(arguments.corners))
+        Aruco.generate_marker_pairs(len(arguments.robots), os.path.join(arguments.print_directory, "small"),
+                                    big=False, dictionary_file=arguments.output, marker_ids=sorted(arguments.robots))
+
+
+if __name__ == '__main__':
+    main()
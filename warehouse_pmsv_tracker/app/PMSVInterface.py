@@ -72,13 +72,14 @@ After this, robots can be controlled through the webinterface or through the API
 import logging
 import os
 
-from flask import Flask, jsonify
+from flask import Flask, jsonify, Response
 
 from warehouse_pmsv_tracker.app.encoder import PMSVJSONEncoder
 from warehouse_pmsv_tracker.app.route import construct_robot_blueprint, construct_camfeed_blueprint, \
     construct_scenario_blueprint
 from warehouse_pmsv_tracker.app.route.ConfigurationBluePrint import construct_configuration_blueprint
 from warehouse_pmsv_tracker.detection.aruco import ArucoQuad
+from warehouse_pmsv_tracker.util.metrics import default_registry
 from warehouse_pmsv_tracker.util.shape import Rectangle
 from warehouse_pmsv_tracker.warehouse import WarehousePMSV
 
@@ -87,6 +88,15 @@ log.setLevel(logging.ERROR)
 
 testarea_corner_markers = ArucoQuad(1,4,0,5)
 testarea_dimensions = Rectangle(0, 0, 1200, 650)
+filter_robot_poses = False
+testarea_file = "../../resources/testarea.yaml"
+detection_scale = 1.
+aruco_parameter_file = None
+# Marker dictionary created by GenerateMarkerDictionary, or None to detect the original Aruco dictionary
+aruco_dictionary_file = None
+undistortion_cache_directory = "../../resources/undistortion_cache"
+# List of CameraConfigurations to cover the test area with multiple cameras, or None to use the single default camera
+cameras = None
 
 
 def start_pmsv_interface():
@@ -96,7 +106,14 @@ def start_pmsv_interface():
 
     warehouse_pmsv = WarehousePMSV(
         testarea_corner_markers,
-        testarea_dimensions
+        testarea_dimensions,
+        filter_robot_poses,
+        area_file=testarea_file,
+        detection_scale=detection_scale,
+        aruco_parameter_file=aruco_parameter_file,
+        aruco_dictionary_file=aruco_dictionary_file,
+        undistortion_cache_directory=undistortion_cache_directory,
+        cameras=cameras
     )
 
     pmsv_webinterface.register_blueprint(construct_camfeed_blueprint(warehouse_pmsv), url_prefix='/webcam')
@@ -116,8 +133,34 @@ def start_pmsv_interface():
         :return:
         """
 
-        return jsonify(area_detected=warehouse_pmsv.detection_pipeline.testarea_position_transformer is not None)
+        return jsonify(area_detected=warehouse_pmsv.detection_pipeline.is_area_detected())
 
+    @pmsv_webinterface.route("/detection_rate")
+    def detection_rate():
+        """
+        Get the frame rate the detection currently aims for, and the frame rate it actually reaches
+        :return:
+        """
+        governor = warehouse_pmsv.frame_rate_governor
+        return jsonify(target_rate=governor.target_rate, actual_rate=governor.actual_rate, idle=governor.is_idle())
+
+    @pmsv_webinterface.route("/control_loop")
+    def control_loop_statistics():
+        """
+        Get the run and deadline miss statistics of the tasks in the PMSV's control loops
+        :return:
+        """
+        return jsonify(running=warehouse_pmsv.is_running, tasks=warehouse_pmsv.get_loop_statistics())
+
+    @pmsv_webinterface.route("/metrics")
+    def metrics():
+        """
+        Get the duration percentiles of all processing stages, in the Prometheus text format
+        :return:
+        """
+        return Response(default_registry.to_prometheus(), mimetype="text/plain; version=0.0.4")
+
+    warehouse_pmsv.start()
     pmsv_webinterface.run("0.0.0.0")
 
 
@@ -79,7 +79,8 @@ class PMSVJSONEncoder(JSONEncoder):
         if isinstance(o, Pose):
             return {
                 "position": o.position,
-                "angle": o.angle
+                "angle": o.angle,
+                "timestamp": o.timestamp
             }
 
         if isinstance(o, ConfigValueInformation):
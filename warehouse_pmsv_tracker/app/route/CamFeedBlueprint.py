@@ -18,43 +18,38 @@
 #
 
 
-import cv2
 from flask import Blueprint, Response, jsonify
 
+from warehouse_pmsv_tracker.app.stream import MJPEGBroadcaster
 from warehouse_pmsv_tracker.warehouse import WarehousePMSV
 
 
-def construct_camfeed_blueprint(pmsv: WarehousePMSV):
+def construct_camfeed_blueprint(pmsv: WarehousePMSV, jpeg_quality: int = 80, max_frame_rate: float = 15.):
     """
     Flask Blueprint to add a live webstream
 
-    IMPORTANT: Because of the way flask handles multitasking, this endpoint also updates the PMSV each frame (processing
-    incoming wireless data and processing computer vision).
-    Because of this, the PMSV is not updated when this stream is not running.
+    The stream only reads the last processed frame of the PMSV, the PMSV itself is updated by its own control loop.
+    All viewers share a single MJPEG encoder, so each frame is encoded only once, no matter how many viewers are
+    connected.
 
-    :param pmsv: PMSV that is updated each frame
+    :param pmsv: PMSV to show the camera feed of
+    :param jpeg_quality: JPEG quality of the stream, between 0 and 100
+    :param max_frame_rate: Maximum amount of frames per second sent to the viewers
     :return:  The blueprint for the webcam route
     """
     camfeed_blueprint = Blueprint("camfeed", __name__)
 
-    def cameragenerator():
-        """
-        Flask Generator. Continuously yields a webcamframe, while updating the PMSV
-        :return: Seperate frames
-        """
-        while True:
-            pmsv.update()
-            retval, buffer = cv2.imencode('.png', pmsv.detection_pipeline.undistorted_image)
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/png\r\n\r\n' + buffer.tobytes() + b'\r\n')
+    broadcaster = MJPEGBroadcaster(pmsv.detection_pipeline.get_annotated_image,
+                                   lambda: pmsv.detection_pipeline.frame_number,
+                                   jpeg_quality, max_frame_rate)
 
     @camfeed_blueprint.route('/video_feed')
     def video_feed():
         """
-        Return a response that uses the cameragenerator to produce frames
+        Return a response that streams the frames produced by the shared broadcaster
         :return:
         """
-        return Response(cameragenerator(),
+        return Response(broadcaster.stream(),
                         mimetype='multipart/x-mixed-replace; boundary=frame')
 
 
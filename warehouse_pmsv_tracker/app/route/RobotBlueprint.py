@@ -18,7 +18,7 @@
 #
 
 
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 
 from warehouse_pmsv_tracker.warehouse import WarehousePMSV
 
@@ -74,6 +74,41 @@ def construct_robot_blueprint(pmsv: WarehousePMSV):
         pmsv.robots[int(id)].rotate_degrees(int(deg), int(direction) == 1)
         return jsonify(success=True)
 
+    @robot_blueprint.route("/<id>/pose_history")
+    def get_pose_history(id):
+        """
+        Retrieve the recorded poses of a robot.
+
+        The optional query parameters start and end (timestamps as returned by time.time()) limit the poses to a
+        time range
+        :param id: ID of the robot to query
+        :return: Poses: a list of all recorded poses in the range, oldest first
+        """
+        if int(id) not in pmsv.robots:
+            return jsonify(error="Unknown robot")
+
+        start = request.args.get("start", type=float)
+        end = request.args.get("end", type=float)
+        return jsonify(poses=pmsv.robots[int(id)].pose_history.get_poses(start, end))
+
+    @robot_blueprint.route("/<id>/pose_at/<timestamp>")
+    def get_pose_at(id, timestamp):
+        """
+        Retrieve the pose of a robot at a moment in time, interpolated from its pose history
+        :param id: ID of the robot to query
+        :param timestamp: Time (as returned by time.time()) to retrieve the pose for
+        :return: Pose: the interpolated pose, or null if the timestamp is outside of the recorded history
+        """
+        if int(id) not in pmsv.robots:
+            return jsonify(error="Unknown robot")
+
+        try:
+            timestamp = float(timestamp)
+        except ValueError:
+            return jsonify(success=False, error="Invalid timestamp")
+
+        return jsonify(pose=pmsv.robots[int(id)].pose_history.get_pose_at(timestamp))
+
     @robot_blueprint.route("/<id>/newmessages")
     def get_history(id):
         """
@@ -0,0 +1,146 @@
+#
+# Copyright (c) 2021. Niels Post. AI Lab Vrije Universiteit Brussel.
+#
+# This file is part of MP-Firm.
+#
+# MP-Firm is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MP-Firm is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MP-Firm.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+import threading
+import time
+from typing import Callable, Optional, Iterator
+
+import cv2
+import numpy as np
+
+from warehouse_pmsv_tracker.util.metrics import default_registry
+
+
+class MJPEGBroadcaster:
+    """
+    Shares one MJPEG encoded camera stream between all connected clients.
+
+    A single encoder thread JPEG-encodes each new frame once, at most max_frame_rate times per second, and all
+    subscribers receive the same bytes. Each subscriber always takes the newest encoded frame, so a slow client skips
+    frames instead of building up a backlog. The encoder thread only runs while there is at least one subscriber.
+    """
+
+    def __init__(self, frame_source: Callable[[], Optional[np.ndarray]], frame_id_source: Callable[[], int],
+                 quality: int = 80, max_frame_rate: float = 15.):
+        """
+        Create an MJPEGBroadcaster
+        :param frame_source: Returns the image to encode. Only called when frame_id_source reports a new frame
+        :param frame_id_source: Returns an identifier of the current frame, which changes when a new frame is available
+        :param quality: JPEG quality, between 0 and 100
+        :param max_frame_rate: Maximum amount of frames encoded per second
+        """
+        self.frame_source = frame_source
+        self.frame_id_source = frame_id_source
+        self.quality = quality
+        self.max_frame_rate = max_frame_rate
+
+        self.frames_encoded = 0
+        self._jpeg: Optional[bytes] = None
+        self._jpeg_time = 0.
+        self._sequence = 0
+        self._subscribers = 0
+        self._encoder_thread: Optional[threading.Thread] = None
+        self._condition = threading.Condition()
+
+    @property
+    def subscribers(self) -> int:
+        """
+        Amount of clients currently receiving the stream
+        """
+        return self._subscribers
+
+    def _subscribe(self):
+        with self._condition:
+            self._subscribers += 1
+            if self._encoder_thread is None:
+                self._encoder_thread = threading.Thread(target=self._encode_loop, name="MJPEGBroadcaster", daemon=True)
+                self._encoder_thread.start()
+
+    def _unsubscribe(self):
+        with self._condition:
+            self._subscribers -= 1
+
+    def _encode_loop(self):
+        last_frame_id = None
+        next_encode_time = 0.
+
+        while True:
+            with self._condition:
+                if self._subscribers == 0:
+                    self._encoder_thread = None
+                    return
+
+            now = time.time()
+            if now < next_encode_time:
+                time.sleep(next_encode_time - now)
+                continue
+
+            frame_id = self.frame_id_source()
+            if frame_id == last_frame_id:
+                time.sleep(1. / self.max_frame_rate)
+                continue
+
+            image = self.frame_source()
+            if image is None:
+                time.sleep(1. / self.max_frame_rate)
+                continue
+
+            with default_registry.time("stream_encode"):
+                success, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+            if not success:
+                continue
+
+            last_frame_id = frame_id
+            next_encode_time = now + 1. / self.max_frame_rate
+            with self._condition:
+                self._jpeg = buffer.tobytes()
+                self._jpeg_time = now
+                self._sequence += 1
+                self.frames_encoded += 1
+                self._condition.notify_all()
+
+    def stream(self, timeout: float = 1.) -> Iterator[bytes]:
+        """
+        Generator yielding multipart MJPEG chunks for one client.
+
+        A new client immediately receives the last encoded frame only when it is recent. A frame older than the
+        encoding interval, e.g. one left over from before the encoder stopped, is skipped and the client waits for
+        the next encode instead.
+        :param timeout: Maximum time to wait for a new frame before checking again
+        :return: Multipart chunks, each containing one JPEG frame
+        """
+        self._subscribe()
+        try:
+            with self._condition:
+                if time.time() - self._jpeg_time > 1. / self.max_frame_rate:
+                    last_sequence = self._sequence
+                else:
+                    last_sequence = self._sequence - 1
+            while True:
+                with self._condition:
+                    self._condition.wait_for(lambda: self._sequence != last_sequence, timeout)
+                    sequence, jpeg = self._sequence, self._jpeg
+                if sequence == last_sequence or jpeg is None:
+                    continue
+                last_sequence = sequence
+                yield (b'--frame\r\n'
+                       b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
+        finally:
+            self._unsubscribe()
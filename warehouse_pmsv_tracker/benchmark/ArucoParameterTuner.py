@@ -0,0 +1,191 @@
+#
+# Copyright (c) 2021. Niels Post. AI Lab Vrije Universiteit Brussel.
+#
+# This file is part of MP-Firm.
+#
+# MP-Firm is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MP-Firm is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MP-Firm.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+import time
+from typing import List, Set, Optional, Dict, Any, NamedTuple, Tuple
+
+import cv2
+import numpy as np
+from cv2 import aruco
+
+from warehouse_pmsv_tracker.detection.aruco import Aruco
+
+
+class TuningScore(NamedTuple):
+    """
+    How well a set of detector parameters performs on the tuning frames
+    """
+    frames_per_second: float
+    recall: float
+    id_stability: float
+    unexpected_detections: int
+
+    def __repr__(self):
+        return "%.1f frames/s, recall %.2f%%, id stability %.2f%%, %d unexpected detections" % (
+            self.frames_per_second, self.recall * 100, self.id_stability * 100, self.unexpected_detections)
+
+
+class ArucoParameterTuner:
+    """
+    Tunes Aruco detector parameters for a set of frames.
+
+    Every candidate is scored on detection speed, recall (the fraction of expected markers that were detected) and
+    id stability (the fraction of markers, expected in two consecutive frames, that were not detected in only one of
+    them). Candidates that reach the minimum recall and stability are ranked by speed. Others are ranked below them,
+    by recall and stability.
+
+    The search is a coordinate descent: starting from OpenCV's defaults, each parameter is swept over its candidate
+    values while the others are kept fixed, and the best value is kept. This is repeated for a number of rounds.
+    """
+
+    SEARCH_SPACE: Dict[str, List[Any]] = {
+        "adaptiveThreshWinSizeMin": [3, 5, 7, 11],
+        "adaptiveThreshWinSizeMax": [11, 15, 23, 33, 53],
+        "adaptiveThreshWinSizeStep": [4, 6, 10, 16, 30],
+        "adaptiveThreshConstant": [5., 7., 10.],
+        "minMarkerPerimeterRate": [.01, .02, .03, .05],
+        "polygonalApproxAccuracyRate": [.03, .05, .08],
+        "perspectiveRemovePixelPerCell": [2, 4, 8],
+        "cornerRefinementMethod": [aruco.CORNER_REFINE_NONE, aruco.CORNER_REFINE_SUBPIX, aruco.CORNER_REFINE_CONTOUR],
+    }
+
+    def __init__(self, frames: List[np.ndarray], expected_ids: Optional[List[Set[int]]] = None,
+                 aruco_dict_id=aruco.DICT_ARUCO_ORIGINAL, detection_scale: float = 1., min_recall: float = .99,
+                 min_id_stability: float = .99, search_space: Optional[Dict[str, List[Any]]] = None,
+                 repeats: int = 3, min_improvement: float = .02, dictionary_file: Optional[str] = None):
+        """
+        Create a tuner
+        :param frames: Frames to tune on, as they are passed to Aruco (so undistorted)
+        :param expected_ids: The markers visible in each frame. When None (for example for recorded frames), the
+        markers OpenCV's default parameters find are used
+        :param aruco_dict_id: Which Aruco Dictionary to detect markers from
+        :param detection_scale: Scale to detect markers at, see Aruco
+        :param min_recall: Minimum recall a candidate needs to be ranked by speed
+        :param min_id_stability: Minimum id stability a candidate needs to be ranked by speed
+        :param search_space: Candidate values per parameter, defaults to SEARCH_SPACE
+        :param repeats: Amount of times the frames are processed per candidate. The fastest pass is used as its speed
+        :param min_improvement: Relative speedup a candidate needs to replace the best parameters, so timing noise is
+        not mistaken for an improvement
+        :param dictionary_file: Marker dictionary (see MarkerDictionary) to detect markers from instead of
+        aruco_dict_id. Tune with the dictionary that is deployed, since it affects which parameters work best
+        """
+        self.frames = [frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) for frame in frames]
+        self.aruco_dict_id = aruco_dict_id
+        self.dictionary_file = dictionary_file
+        self.detection_scale = detection_scale
+        self.min_recall = min_recall
+        self.min_id_stability = min_id_stability
+        self.search_space = search_space if search_space is not None else self.SEARCH_SPACE
+        self.repeats = repeats
+        self.min_improvement = min_improvement
+
+        # Also warms up OpenCV, so the first candidate is not timed slower than the rest
+        detector = self._create_detector(dict())
+        default_ids = [set(detector.process(frame).ids.tolist()) for frame in self.frames]
+        self.expected_ids = expected_ids if expected_ids is not None else default_ids
+
+    def _create_detector(self, parameters: Dict[str, Any]) -> Aruco:
+        detector = Aruco(self.aruco_dict_id, self.detection_scale, dictionary_file=self.dictionary_file)
+        for name, value in parameters.items():
+            setattr(detector.parameters, name, value)
+        return detector
+
+    @staticmethod
+    def _is_valid(parameters: Dict[str, Any]) -> bool:
+        return parameters.get("adaptiveThreshWinSizeMin", 3) <= parameters.get("adaptiveThreshWinSizeMax", 23)
+
+    def evaluate(self, parameters: Dict[str, Any]) -> TuningScore:
+        """
+        Score a set of detector parameters on the tuning frames
+        :param parameters: Detector parameters to change from OpenCV's defaults
+        :return: The score of the parameters
+        """
+        detector = self._create_detector(parameters)
+
+        duration = float("inf")
+        for _ in range(self.repeats):
+            start = time.perf_counter()
+            detected_ids = [set(detector.process(frame).ids.tolist()) for frame in self.frames]
+            duration = min(duration, time.perf_counter() - start)
+
+        expected_count = sum(len(expected) for expected in self.expected_ids)
+        found_count = sum(len(detected & expected) for detected, expected in zip(detected_ids, self.expected_ids))
+        unexpected = sum(len(detected - expected) for detected, expected in zip(detected_ids, self.expected_ids))
+
+        consecutive = 0
+        flickering = 0
+        for previous in range(len(self.frames) - 1):
+            expected_in_both = self.expected_ids[previous] & self.expected_ids[previous + 1]
+            consecutive += len(expected_in_both)
+            flickering += len((detected_ids[previous] ^ detected_ids[previous + 1]) & expected_in_both)
+
+        return TuningScore(
+            frames_per_second=len(self.frames) / duration,
+            recall=found_count / expected_count if expected_count else 1.,
+            id_stability=1. - flickering / consecutive if consecutive else 1.,
+            unexpected_detections=unexpected
+        )
+
+    def _is_acceptable(self, score: TuningScore) -> bool:
+        return score.recall >= self.min_recall and score.id_stability >= self.min_id_stability
+
+    def _is_improvement(self, score: TuningScore, best_score: TuningScore) -> bool:
+        if self._is_acceptable(score) != self._is_acceptable(best_score):
+            return self._is_acceptable(score)
+        if self._is_acceptable(score):
+            return score.frames_per_second > best_score.frames_per_second * (1 + self.min_improvement)
+        return score.recall * score.id_stability > best_score.recall * best_score.id_stability
+
+    def tune(self, rounds: int = 2, verbose: bool = False) -> Tuple[Dict[str, Any], TuningScore]:
+        """
+        Search for the best detector parameters
+        :param rounds: Amount of times every parameter is swept
+        :param verbose: When True, every improvement is printed
+        :return: The best parameters (only those that differ from OpenCV's defaults), and their score
+        """
+        best_parameters: Dict[str, Any] = dict()
+        best_score = self.evaluate(best_parameters)
+        if verbose:
+            print("default parameters: %s" % (best_score,))
+
+        for _ in range(rounds):
+            for name, values in self.search_space.items():
+                for value in values:
+                    candidate = {**best_parameters, name: value}
+                    if candidate == best_parameters or not self._is_valid(candidate):
+                        continue
+
+                    score = self.evaluate(candidate)
+                    if self._is_improvement(score, best_score):
+                        best_parameters, best_score = candidate, score
+                        if verbose:
+                            print("%s = %s: %s" % (name, value, score))
+
+        # Timing is noisy, so measure the winner once more before reporting it
+        return best_parameters, self.evaluate(best_parameters)
+
+    def save(self, parameters: Dict[str, Any], parameter_file: str) -> None:
+        """
+        Write detector parameters to a parameter profile
+        :param parameters: Parameters to write, as returned by tune
+        :param parameter_file: File to write to
+        :return: None
+        """
+        self._create_detector(parameters).save_parameters(parameter_file)
@@ -0,0 +1,86 @@
+#
+# Copyright (c) 2021. Niels Post. AI Lab Vrije Universiteit Brussel.
+#
+# This file is part of MP-Firm.
+#
+# MP-Firm is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MP-Firm is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MP-Firm.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+"""
+    Search for Aruco detector parameters that detect faster, without losing markers.
+
+    Frames can be taken from a recording (see FrameRecorder) or rendered by a SyntheticScene. The best parameters are
+    written to a parameter profile, which can be loaded using Aruco(parameter_file=...).
+
+    Example: python -m warehouse_pmsv_tracker.benchmark.ArucoParameterTuning --recording session/ \\
+        --calibration resources/cybertrack_h3_calibration.yaml --output resources/aruco_parameters.yaml
+"""
+import argparse
+from typing import List, Optional
+
+import numpy as np
+
+from warehouse_pmsv_tracker.benchmark import ArucoParameterTuner, SyntheticScene
+from warehouse_pmsv_tracker.detection.calibration import CameraUndistortion
+from warehouse_pmsv_tracker.detection.capture import ReplayCapture
+
+
+def _load_recording(recording_directory: str, calibration_file: Optional[str], max_frames: int) -> List[np.ndarray]:
+    replay = ReplayCapture(recording_directory)
+    undistortion = CameraUndistortion(calibration_file) if calibration_file is not None else None
+    frames = []
+    for _ in range(min(max_frames, len(replay))):
+        image = replay.read_frame().image
+        frames.append(undistortion.undistort(image) if undistortion is not None else np.array(image))
+    replay.release()
+    return frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune Aruco detector parameters")
+    parser.add_argument("--output", required=True, help="File to write the parameter profile to")
+    parser.add_argument("--recording", default=None,
+                        help="Recording to tune on. When not given, synthetic frames are rendered")
+    parser.add_argument("--calibration", default=None,
+                        help="Calibration file to undistort recorded frames with")
+    parser.add_argument("--frames", type=int, default=100, help="Maximum amount of frames to tune on")
+    parser.add_argument("--resolution", default="640x480", help="Resolution of synthetic frames, as WIDTHxHEIGHT")
+    parser.add_argument("--robots", type=int, default=10, help="Amount of robots in synthetic frames")
+    parser.add_argument("--detection-scale", type=float, default=1., help="Scale to detect markers at")
+    parser.add_argument("--rounds", type=int, default=2, help="Amount of times every parameter is swept")
+    parser.add_argument("--dictionary", default=None,
+                        help="Marker dictionary (see MarkerDictionary) the deployed markers are printed from")
+    arguments = parser.parse_args()
+
+    if arguments.recording is not None:
+        frames = _load_recording(arguments.recording, arguments.calibration, arguments.frames)
+        expected_ids = None
+    else:
+        width, height = (int(value) for value in arguments.resolution.lower().split("x"))
+        scene = SyntheticScene((width, height), arguments.robots, dictionary_file=arguments.dictionary)
+        frames = [scene.render_undistorted(i) for i in range(arguments.frames)]
+        expected_ids = [set(scene.testarea_corners) | set(scene.robot_ids)] * len(frames)
+        scene.close()
+
+    tuner = ArucoParameterTuner(frames, expected_ids, detection_scale=arguments.detection_scale,
+                                dictionary_file=arguments.dictionary)
+    parameters, score = tuner.tune(arguments.rounds, verbose=True)
+    print("best parameters: %s" % parameters)
+    print("score: %s" % (score,))
+    tuner.save(parameters, arguments.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+#
+# Copyright (c) 2021. Niels Post. AI Lab Vrije Universiteit Brussel.
+#
+# This file is part of MP-Firm.
+#
+# MP-Firm is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MP-Firm is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MP-Firm.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+import time
+from typing import List, Tuple, Optional, NamedTuple, Dict, Callable
+
+import numpy as np
+
+from warehouse_pmsv_tracker.benchmark.SyntheticScene import SyntheticScene
+from warehouse_pmsv_tracker.detection import ArucoDetectionPipeline
+from warehouse_pmsv_tracker.detection.aruco import Aruco, ArucoID
+from warehouse_pmsv_tracker.detection.calibration import CameraUndistortion
+from warehouse_pmsv_tracker.detection.capture import FrameSource, CapturedFrame
+from warehouse_pmsv_tracker.detection.transformation import PositionTransformer
+from warehouse_pmsv_tracker.util.metrics import MetricsRegistry
+from warehouse_pmsv_tracker.util.shape import Pose, calculate_batch_poses
+
+
+class StageStatistics(NamedTuple):
+    """
+    Latency of one stage of the pipeline, in milliseconds
+    """
+    name: str
+    mean: float
+    p50: float
+    p95: float
+    p99: float
+
+    @classmethod
+    def from_durations(cls, name: str, durations: List[float]) -> 'StageStatistics':
+        milliseconds = np.asarray(durations) * 1000
+        # The same quantiles as the metrics endpoint exports, so both can be compared directly
+        percentiles = np.percentile(milliseconds, [q * 100 for q in MetricsRegistry.QUANTILES])
+        return cls(name, float(milliseconds.mean()), *percentiles.tolist())
+
+
+class BenchmarkResult(NamedTuple):
+    """
+    Results of benchmarking the pipeline on one synthetic scene
+    """
+    resolution: Tuple[int, int]
+    robot_count: int
+    frame_count: int
+    detection_scale: float
+    stages: List[StageStatistics]
+    frames_per_second: float
+    detection_rate: float
+    mean_position_error: float
+    max_position_error: float
+    mean_angle_error: float
+    max_angle_error: float
+
+    def format(self) -> str:
+        """
+        Create a human readable report of the results
+        :return: The report
+        """
+        lines = ["%dx%d, %d robots, %d frames, detection scale %.2f: %.1f frames/s"
+                 % (*self.resolution, self.robot_count, self.frame_count, self.detection_scale,
+                    self.frames_per_second),
+                 "  %-14s %8s %8s %8s %8s" % ("stage (ms)", "mean", "p50", "p95", "p99")]
+        lines += ["  %-14s %8.2f %8.2f %8.2f %8.2f" % stage for stage in self.stages]
+        lines.append("  detected %.1f%% of robot poses, position error mean %.2f max %.2f, "
+                     "angle error mean %.2f max %.2f degrees"
+                     % (self.detection_rate * 100, self.mean_position_error, self.max_position_error,
+                        self.mean_angle_error, self.max_angle_error))
+        return "\n".join(lines)
+
+
+class _LoopingFrameSource(FrameSource):
+    """
+    Hands out a list of pre-rendered frames over and over, so rendering is not part of the measured time
+    """
+
+    def __init__(self, frames: List[np.ndarray], frame_rate: float):
+        self.frames = frames
+        self.frame_rate = frame_rate
+        self._frame_number = 0
+
+    def read_frame(self) -> Optional[CapturedFrame]:
+        image = self.frames[self._frame_number % len(self.frames)]
+        self._frame_number += 1
+        return CapturedFrame(image, self._frame_number / self.frame_rate, self._frame_number)
+
+
+def _time_calls(function: Callable, arguments: List) -> Tuple[List[float], List]:
+    durations = []
+    results = []
+    for argument in arguments:
+        start = time.perf_counter()
+        results.append(function(argument))
+        durations.append(time.perf_counter() - start)
+    return durations, results
+
+
+def _angle_error(a: float, b: float) -> float:
+    return abs((a - b + 180) % 360 - 180)
+
+
+def run_benchmark(resolution: Tuple[int, int] = (640, 480), robot_count: int = 4, frame_count: int = 100,
+                  calibration_file: Optional[str] = None, detection_scale: float = 1.,
+                  aruco_parameter_file: Optional[str] = None, **pipeline_options) -> BenchmarkResult:
+    """
+    Benchmark the pipeline stages, and the full pipeline, on a synthetic scene.
+
+    Each stage is timed separately over all frames first: undistortion, marker detection, and the transformation of
+    the detected markers to real world poses. Then, the full pipeline processes all frames, and the poses it
+    dispatches are compared to the true poses of the robots.
+    :param resolution: Width and height of the frames
+    :param robot_count: Amount of robots in the scene
+    :param frame_count: Amount of frames to process
+    :param calibration_file: Calibration file whose distortion model is applied to the frames, or None to render frames
+    without distortion
+    :param detection_scale: Scale markers are detected at, both in the separately timed detection stage and in the
+    pipeline
+    :param aruco_parameter_file: Aruco detector parameter profile to use instead of OpenCV's defaults
+    :param pipeline_options: Extra keyword arguments for the ArucoDetectionPipeline, for example detection_workers
+    :return: The benchmark results
+    """
+    scene = SyntheticScene(resolution, robot_count, calibration_file=calibration_file)
+    try:
+        frames = [scene.render(i) for i in range(frame_count)]
+
+        undistortion = CameraUndistortion(scene.calibration_file)
+        undistort_durations, undistorted_frames = _time_calls(undistortion.undistort, frames)
+
+        aruco_detection = Aruco(detection_scale=detection_scale, parameter_file=aruco_parameter_file)
+        detect_durations, detection_results = _time_calls(aruco_detection.process, undistorted_frames)
+
+        transformer = PositionTransformer(scene.area_quad, scene.real_testarea_size)
+        transform_durations, _ = _time_calls(
+            lambda result: calculate_batch_poses(transformer.transform_points(result.corners)), detection_results)
+
+        pipeline = ArucoDetectionPipeline(_LoopingFrameSource(frames, scene.frame_rate), scene.calibration_file,
+                                          scene.testarea_corners, scene.real_testarea_size,
+                                          detection_scale=detection_scale,
+                                          aruco_parameter_file=aruco_parameter_file, **pipeline_options)
+
+        position_errors: List[float] = []
+        angle_errors: List[float] = []
+
+        def on_frame_poses(poses: Dict[ArucoID, Pose], timestamp: float):
+            truth = scene.get_ground_truth((pipeline.frame_number - 1) % frame_count)
+            for marker_id, pose in poses.items():
+                if marker_id not in truth:
+                    continue
+                position_errors.append(float(np.hypot(pose.position[0] - truth[marker_id].position[0],
+                                                      pose.position[1] - truth[marker_id].position[1])))
+                angle_errors.append(_angle_error(pose.angle, truth[marker_id].angle))
+
+        pipeline.add_frame_pose_listener(on_frame_poses)
+
+        # The first frame adds all markers to the tracked markers, poses are dispatched starting at the second one
+        pipeline.process_next_frame()
+        pipeline_durations, _ = _time_calls(lambda _: pipeline.process_next_frame(), range(frame_count))
+        # With detection workers, the last frames are still in flight, so their poses are collected as well
+        drain_start = time.perf_counter()
+        pipeline.flush_detections()
+        drain_duration = time.perf_counter() - drain_start
+        pipeline.release()
+    finally:
+        scene.close()
+
+    return BenchmarkResult(
+        resolution=resolution,
+        robot_count=robot_count,
+        frame_count=frame_count,
+        detection_scale=detection_scale,
+        stages=[StageStatistics.from_durations("undistort", undistort_durations),
+                StageStatistics.from_durations("detect", detect_durations),
+                StageStatistics.from_durations("transform", transform_durations),
+                StageStatistics.from_durations("pipeline", pipeline_durations)],
+        frames_per_second=frame_count / (sum(pipeline_durations) + drain_duration),
+        detection_rate=len(position_errors) / (robot_count * frame_count) if robot_count else 1.,
+        mean_position_error=float(np.mean(position_errors)) if position_errors else float("nan"),
+        max_position_error=max(position_errors, default=float("nan")),
+        mean_angle_error=float(np.mean(angle_errors)) if angle_errors else float("nan"),
+        max_angle_error=max(angle_errors, default=float("nan"))
+    )
@@ -0,0 +1,246 @@
+#
+# Copyright (c) 2021. Niels Post. AI Lab Vrije Universiteit Brussel.
+#
+# This file is part of MP-Firm.
+#
+# MP-Firm is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MP-Firm is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MP-Firm.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+import os
+import shutil
+import tempfile
+from typing import Tuple, Optional, Dict, List
+
+import cv2
+import numpy as np
+from cv2 import aruco
+
+from warehouse_pmsv_tracker.detection.aruco import ArucoID, ArucoQuad, MarkerDictionary
+from warehouse_pmsv_tracker.util.shape import Pose, Quadrilateral, Rectangle
+
+
+class SyntheticScene:
+    """
+    Renders camera frames of a test area with moving robots, for which the true poses are known.
+
+    The test area is placed in the image as an irregular quadrilateral, like a camera that is not exactly perpendicular
+    to the ground would see it. Its corner markers are placed so their outer corners are exactly the corners of the
+    area, and each robot marker drives in a circle around its own spot on a grid.
+
+    Frames are rendered as the camera would deliver them: vertically flipped and, when a calibration file is given,
+    distorted by the calibration's distortion model. The scene writes a calibration file for its resolution, which
+    should be used to undistort the rendered frames.
+    """
+
+    def __init__(self, resolution: Tuple[int, int] = (640, 480), robot_count: int = 4,
+                 testarea_corners: ArucoQuad = ArucoQuad(1, 4, 0, 5),
+                 real_testarea_size: Rectangle = Rectangle(0, 0, 1200, 650), marker_size: float = 60.,
+                 calibration_file: Optional[str] = None, frame_rate: float = 30.,
+                 aruco_dict_id=aruco.DICT_ARUCO_ORIGINAL, seed: int = 0, dictionary_file: Optional[str] = None):
+        """
+        Create a synthetic scene
+        :param resolution: Width and height of the rendered frames
+        :param robot_count: Amount of robot markers in the test area
+        :param testarea_corners: IDs of the markers marking the corners of the test area
+        :param real_testarea_size: Real world size of the test area
+        :param marker_size: Real world size of the markers
+        :param calibration_file: Calibration file whose distortion model (scaled to the resolution) is applied to the
+        frames, or None to render frames without distortion
+        :param frame_rate: Frame rate of the simulated camera, used to calculate the time of each frame
+        :param aruco_dict_id: Aruco dictionary to draw markers from
+        :param seed: Seed for the random starting positions and directions of the robots
+        :param dictionary_file: Marker dictionary (see MarkerDictionary) to draw markers from instead of aruco_dict_id.
+        The robots then get the IDs in the dictionary that are not test area corners
+        """
+        self.resolution = resolution
+        self.testarea_corners = testarea_corners
+        self.real_testarea_size = real_testarea_size
+        self.marker_size = marker_size
+        self.frame_rate = frame_rate
+        self.marker_dictionary: Optional[MarkerDictionary] = None
+        if dictionary_file is not None:
+            self.marker_dictionary = MarkerDictionary.load(dictionary_file)
+            self.aruco_dict = self.marker_dictionary.dictionary
+            available_ids = self.marker_dictionary.get_ids()
+            if not set(testarea_corners) <= set(available_ids):
+                raise ValueError("The test area corners %s are not all in the marker dictionary" % (testarea_corners,))
+        else:
+            self.aruco_dict = aruco.Dictionary_get(aruco_dict_id)
+            available_ids = list(range(robot_count + 4))
+        self.robot_ids: List[ArucoID] = [marker_id for marker_id in available_ids
+                                         if marker_id not in testarea_corners][:robot_count]
+        if len(self.robot_ids) < robot_count:
+            raise ValueError("The marker dictionary only has IDs for %i robots" % len(self.robot_ids))
+
+        self._directory = tempfile.mkdtemp(prefix="pmsv_benchmark_")
+        self.calibration_file = os.path.join(self._directory, "calibration.yaml")
+        self._setup_camera(calibration_file)
+        self._setup_area()
+        self._setup_robots(np.random.default_rng(seed))
+
+    def _setup_camera(self, calibration_file: Optional[str]):
+        w, h = self.resolution
+        if calibration_file is not None:
+            fs = cv2.FileStorage(calibration_file, cv2.FILE_STORAGE_READ)
+            scale = np.array([w / fs.getNode("image_width").real(), h / fs.getNode("image_height").real(), 1.])
+            camera_matrix = fs.getNode("camera_matrix").mat() * scale[:, None]
+            distortion_coefficients = fs.getNode("distortion_coefficients").mat()
+            fs.release()
+        else:
+            camera_matrix = np.array([[w, 0, w / 2], [0, w, h / 2], [0, 0, 1]], dtype=np.float64)
+            distortion_coefficients = np.zeros((5, 1))
+
+        fs = cv2.FileStorage(self.calibration_file, cv2.FILE_STORAGE_WRITE)
+        fs.write("image_width", w)
+        fs.write("image_height", h)
+        fs.write("camera_matrix", camera_matrix)
+        fs.write("distortion_coefficients", distortion_coefficients)
+        fs.release()
+
+        # Same undistorted image CameraUndistortion produces, so frames can be drawn in undistorted image space
+        new_camera_matrix, (roi_x, roi_y, roi_w, roi_h) = cv2.getOptimalNewCameraMatrix(
+            camera_matrix, distortion_coefficients, (w, h), 1, (w, h))
+        self.undistorted_size = (roi_w, roi_h)
+
+        grid = np.stack(np.meshgrid(np.arange(w), np.arange(h)), axis=-1).astype(np.float64)
+        undistorted = cv2.undistortPoints(grid.reshape(-1, 1, 2), camera_matrix, distortion_coefficients,
+                                          P=new_camera_matrix).reshape(h, w, 2) - (roi_x, roi_y)
+        self._distortion_map = undistorted.astype(np.float32)
+
+    def _setup_area(self):
+        w, h = self.undistorted_size
+        rect = self.real_testarea_size
+        self.area_quad = Quadrilateral((.12 * w, .10 * h), (.88 * w, .13 * h), (.06 * w, .90 * h), (.95 * w, .87 * h))
+
+        world_corners = np.array([rect.get_xy_from_uv(u, v) for u, v in ((0, 0), (1, 0), (0, 1), (1, 1))],
+                                 dtype=np.float32)
+        self._world_to_image = cv2.getPerspectiveTransform(world_corners,
+                                                           self.area_quad.get_contour().astype(np.float32))
+
+        half = self.marker_size / 2
+        self._corner_marker_positions = {
+            marker_id: (x + (half if left else -half), y + (half if top else -half))
+            for marker_id, (x, y), (left, top) in zip(self.testarea_corners, world_corners,
+                                                      ((True, True), (False, True), (True, False), (False, False)))
+        }
+
+    def _setup_robots(self, rng: np.random.Generator):
+        rect = self.real_testarea_size
+        count = len(self.robot_ids)
+        columns = int(np.ceil(np.sqrt(count * rect.w / rect.h))) if count else 1
+        rows = int(np.ceil(count / columns)) if count else 1
+
+        # Keep robots away from the corner markers and out of each other's cell
+        margin = self.marker_size * 2
+        cell_w = (rect.w - 2 * margin) / columns
+        cell_h = (rect.h - 2 * margin) / rows
+        self._circle_radius = max(0., (min(cell_w, cell_h) - self.marker_size * 1.5) / 2)
+
+        self._robot_homes = np.array([(rect.x + margin + (i % columns + .5) * cell_w,
+                                       rect.y + margin + (i // columns + .5) * cell_h) for i in range(count)])
+        self._robot_phases = rng.uniform(0, 2 * np.pi, count)
+        self._robot_headings = rng.uniform(0, 360, count)
+
+    def get_time(self, frame_index: int) -> float:
+        """
+        Get the time of a frame, relative to the first frame
+        :param frame_index: Index of the frame
+        :return: Time in seconds
+        """
+        return frame_index / self.frame_rate
+
+    def get_ground_truth(self, frame_index: int) -> Dict[ArucoID, Pose]:
+        """
+        Get the true poses of all robots in a frame, in real world coordinates
+        :param frame_index: Index of the frame
+        :return: Poses by robot marker ID
+        """
+        t = self.get_time(frame_index)
+        phases = self._robot_phases + t * 0.8
+        xs = self._robot_homes[:, 0] + self._circle_radius * np.cos(phases)
+        ys = self._robot_homes[:, 1] + self._circle_radius * np.sin(phases)
+        angles = (self._robot_headings + t * 45.) % 360
+
+        return {marker_id: Pose((x, y), angle, t)
+                for marker_id, x, y, angle in zip(self.robot_ids, xs.tolist(), ys.tolist(), angles.tolist())}
+
+    def _draw_marker(self, image: np.ndarray, marker_id: ArucoID, position: Tuple[float, float], angle: float):
+        # Markers are printed with a white border, the same width as one bit of the marker
+        bits = self.aruco_dict.markerSize + 2
+        pixels_per_bit = 12
+        if self.marker_dictionary is not None:
+            marker = self.marker_dictionary.draw_marker(int(marker_id), bits * pixels_per_bit)
+        else:
+            marker = aruco.drawMarker(self.aruco_dict, int(marker_id), bits * pixels_per_bit)
+        patch = cv2.copyMakeBorder(marker, pixels_per_bit, pixels_per_bit, pixels_per_bit, pixels_per_bit,
+                                   cv2.BORDER_CONSTANT, value=255)
+        patch_size = patch.shape[0]
+
+        # An upright marker points at 270 degrees (up in the image)
+        radians = np.deg2rad(angle - 270)
+        rotation = np.array([[np.cos(radians), -np.sin(radians)], [np.sin(radians), np.cos(radians)]])
+        half = self.marker_size / 2 * (bits + 2) / bits
+        local = np.array([(-half, -half), (half, -half), (-half, half), (half, half)])
+        world = local @ rotation.T + position
+        corners = cv2.perspectiveTransform(world.reshape(-1, 1, 2), self._world_to_image).reshape(-1, 2)
+
+        x0, y0 = np.floor(corners.min(axis=0)).astype(int)
+        x1, y1 = np.ceil(corners.max(axis=0)).astype(int) + 1
+        x0, y0 = max(x0, 0), max(y0, 0)
+        x1, y1 = min(x1, image.shape[1]), min(y1, image.shape[0])
+        if x1 <= x0 or y1 <= y0:
+            return
+
+        source = np.array([(0, 0), (patch_size, 0), (0, patch_size), (patch_size, patch_size)], dtype=np.float32)
+        homography = cv2.getPerspectiveTransform(source, (corners - (x0, y0)).astype(np.float32))
+        size = (x1 - x0, y1 - y0)
+        warped = cv2.warpPerspective(patch, homography, size, flags=cv2.INTER_AREA)
+        coverage = cv2.warpPerspective(np.full_like(patch, 255), homography, size) / 255.
+
+        region = image[y0:y1, x0:x1]
+        region[:] = (region * (1 - coverage) + warped * coverage).astype(np.uint8)
+
+    def render_undistorted(self, frame_index: int) -> np.ndarray:
+        """
+        Render a frame as it should look after undistortion
+        :param frame_index: Index of the frame
+        :return: Grayscale image with the size of the undistorted region of interest
+        """
+        w, h = self.undistorted_size
+        image = np.full((h, w), 90, dtype=np.uint8)
+        cv2.fillConvexPoly(image, self.area_quad.get_contour()[[0, 1, 3, 2]].astype(np.int32), 200)
+
+        for marker_id, position in self._corner_marker_positions.items():
+            self._draw_marker(image, marker_id, position, 270)
+        for marker_id, pose in self.get_ground_truth(frame_index).items():
+            self._draw_marker(image, marker_id, pose.position, pose.angle)
+        return image
+
+    def render(self, frame_index: int) -> np.ndarray:
+        """
+        Render a frame as the camera delivers it: distorted and vertically flipped
+        :param frame_index: Index of the frame
+        :return: BGR image with the resolution of the scene
+        """
+        distorted = cv2.remap(self.render_undistorted(frame_index), self._distortion_map, None, cv2.INTER_LINEAR,
+                              borderValue=90)
+        return cv2.cvtColor(cv2.flip(distorted, 0), cv2.COLOR_GRAY2BGR)
+
+    def close(self):
+        """
+        Remove the calibration file written for the scene
+        :return: None
+        """
+        shutil.rmtree(self._directory, ignore_errors=True)
@@ -0,0 +1,61 @@
+#
+# Copyright (c) 2021. Niels Post. AI Lab Vrije Universiteit Brussel.
+#
+# This file is part of MP-Firm.
+#
+# MP-Firm is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MP-Firm is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MP-Firm.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+"""
+    Benchmark the detection pipeline on synthetic frames, without a camera.
+
+    Example: python -m warehouse_pmsv_tracker.benchmark --resolutions 640x480 1280x720 --robots 1 10 30
+"""
+import argparse
+
+from warehouse_pmsv_tracker.benchmark import run_benchmark
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the detection pipeline on synthetic frames")
+    parser.add_argument("--resolutions", nargs="+", default=["640x480", "1280x720", "1920x1080"],
+                        help="Frame resolutions to benchmark, as WIDTHxHEIGHT")
+    parser.add_argument("--robots", nargs="+", type=int, default=[1, 10, 30], help="Robot counts to benchmark")
+    parser.add_argument("--frames", type=int, default=100, help="Amount of frames per benchmark")
+    parser.add_argument("--calibration", default=None,
+                        help="Calibration file whose distortion model is applied to the frames")
+    parser.add_argument("--detection-scales", nargs="+", type=float, default=[1.],
+                        help="Scales to detect markers at before refining their corners at full resolution")
+    parser.add_argument("--parameter-file", default=None, help="Aruco detector parameter profile to benchmark")
+    parser.add_argument("--workers", type=int, default=0, help="Amount of detection worker processes")
+    parser.add_argument("--roi-tracking", action="store_true", help="Only search around tracked markers")
+    parser.add_argument("--undistort-points-only", action="store_true",
+                        help="Undistort marker corners instead of full frames")
+    arguments = parser.parse_args()
+
+    for resolution in arguments.resolutions:
+        width, height = (int(value) for value in resolution.lower().split("x"))
+        for robot_count in arguments.robots:
+            for detection_scale in arguments.detection_scales:
+                result = run_benchmark((width, height), robot_count, arguments.frames, arguments.calibration,
+                                       detection_scale, arguments.parameter_file,
+                                       detection_workers=arguments.workers,
+                                       roi_tracking=arguments.roi_tracking,
+                                       undistort_points_only=arguments.undistort_points_only)
+                print(result.format())
+
+
+if __name__ == '__main__':
+    main()
@@ -25,7 +25,7 @@
     To correct for this, media are undistorted before being used in the tracker. To do this, a camera undistortion
     matrix and distortion coefficients are needed. Both of these are specific to the model of camera, so make sure the
     model camera matches the undistortion file being used (default is a cybertrack H3 webcam). To generate new calibration
-    files, refer to hhtp://link-here.
+    files, use app/CalibrateCamera.py.
 
 
     The demo shows a live view of the webcam, and draws an overlay of the detected markers over it.
@@ -93,7 +93,8 @@ def camera_undistortion_demo():
     capture_device = cv2.VideoCapture(0)
 
     # Create a camera undistorter for the webcam used for the PMSV
-    undistortion = CameraUndistortion("../../resources/cybertrack_h3_calibration.yaml")
+    # Each frame is shown before the next one is undistorted, so the output buffers can be reused
+    undistortion = CameraUndistortion("../../resources/cybertrack_h3_calibration.yaml", reuse_output=True)
 
     while not is_any_closed(windows):
         # Retrieve an image from the webcam
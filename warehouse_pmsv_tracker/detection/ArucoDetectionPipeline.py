@@ -18,43 +18,88 @@
 #
 
 
-from typing import NewType, Callable, List, Union, Dict
+import threading
+from typing import NewType, Callable, List, Union, Dict, Optional, NamedTuple, Tuple, Set, FrozenSet
 
 import cv2
+import numpy as np
 
-from warehouse_pmsv_tracker.detection.aruco import ArucoID, ArucoQuad, Aruco
+from warehouse_pmsv_tracker.detection.aruco import ArucoID, ArucoQuad, Aruco, ArucoDetectionResult
 from warehouse_pmsv_tracker.detection.calibration import CameraUndistortion
+from warehouse_pmsv_tracker.detection.capture import FrameSource, FrameGrabber, VideoCaptureSource
+from warehouse_pmsv_tracker.detection.filter import AlphaBetaPoseFilter
+from warehouse_pmsv_tracker.detection.parallel import DetectionWorkerPool, DetectionWorkResult
+from warehouse_pmsv_tracker.detection.PoseListenerRegistry import FramePoseListenerRegistry
 from warehouse_pmsv_tracker.detection.transformation import PositionTransformer
-from warehouse_pmsv_tracker.util.shape import Pose, Quadrilateral, Rectangle
-
-# Called when the pose of a marker changes
-PoseListener = NewType('PoseListener', Callable[[Pose], None])
+from warehouse_pmsv_tracker.util.metrics import default_registry
+from warehouse_pmsv_tracker.util.shape import Pose, Quadrilateral, Rectangle, calculate_batch_poses
 
 # Called when a new marker is found. Method should return True if the marker should be tracked, or false if not
 NewMarkerListener = NewType('NewMarkerListener', Callable[[ArucoID], bool])
 
 
-class ArucoDetectionPipeline:
+class _MarkerTrack(NamedTuple):
+    """
+    Last known image position of a tracked marker, used to predict where to look for it in the next frame.
+
+    The predicted movement comes from a filter on the image position of the marker's center
+    """
+    corners: np.ndarray
+    center_filter: AlphaBetaPoseFilter
+
+
+def _merge_regions(regions: List[Tuple[int, int, int, int]]) -> List[Tuple[int, int, int, int]]:
+    """
+    Merge overlapping (x, y, w, h) regions into their bounding boxes, until no regions overlap anymore
+    """
+    merged = [(x, y, x + w, y + h) for x, y, w, h in regions]
+    changed = True
+    while changed:
+        changed = False
+        result = []
+        for region in merged:
+            for i, other in enumerate(result):
+                if region[0] < other[2] and other[0] < region[2] and region[1] < other[3] and other[1] < region[3]:
+                    result[i] = (min(region[0], other[0]), min(region[1], other[1]),
+                                 max(region[2], other[2]), max(region[3], other[3]))
+                    changed = True
+                    break
+            else:
+                result.append(region)
+        merged = result
+    return [(x_min, y_min, x_max - x_min, y_max - y_min) for x_min, y_min, x_max, y_max in merged]
+
+
+class ArucoDetectionPipeline(FramePoseListenerRegistry):
     """
     The aruco_markers detection pipeline takes an image from the webcam, and processes it the following way
 
+    0. Retrieve the newest frame from the (threaded) frame source
     1. Undistort image
     2. Detect Aruco Markers
     3. Check if new markers were found
         3.1. If so, call the newMarkerListener
-    4. For each found marker (except markers that are in "corner_markers")
+    4. For all tracked markers at once
         4.1. Transform the markers to quadriletaerals in the given real_testarea_size
-        4.2. Get the pose of the transformed quads
-        4.3. Call each listener associated with the id with the calculated pose
+        4.2. Get the poses of the transformed quads
+        4.3. Call each listener associated with an id with the calculated pose
+        4.4. Call each frame listener once with the poses of all tracked markers
+
+    The test area is detected again in the background, and replaced when its corners have drifted (for example when
+    the camera was bumped).
     """
 
     def _setup_area(self, num_retries: int = 50) -> None:
-        self.testarea_corners = self.testarea_corners
+        if self.area_file is not None:
+            self.testarea_position_transformer = PositionTransformer.load(self.area_file, self.real_testarea_size)
+            if self.testarea_position_transformer is not None:
+                return
+
         for _ in range(num_retries):
-            success, original_image = self.capture_device.read()
-            image = self.camera_undistortion.undistort(original_image)
+            frame = self.frame_source.read_frame()
+            if frame is None: continue
 
-            if not success: continue
+            image = self.camera_undistortion.undistort(frame.image)
 
             detection_result = self.aruco_detection.process(image)
             area = detection_result.get_four_marker_quadrilateral(self.testarea_corners)
@@ -65,70 +110,201 @@ class ArucoDetectionPipeline:
             print("\033[91mCannot find working area\033[0m")
             self.testarea_position_transformer = None
             return
+        self._set_area(area)
+
+    def _set_area(self, area: Quadrilateral) -> None:
+        """
+        Replace the position transformer with one for a new area, and store it when an area file is used.
+
+        The transformer is replaced with a single assignment, so a frame never sees a partially updated transformer.
+        """
         self.testarea_position_transformer = PositionTransformer(area, self.real_testarea_size)
+        if self.area_file is not None:
+            self.testarea_position_transformer.save(self.area_file)
+
+    def _redetect_area(self, aruco_detection_result: ArucoDetectionResult) -> None:
+        """
+        Check if the test area corners in a detection result have drifted from the current area, and if so, replace it
+        """
+        self._frames_since_area_check += 1
+        if self._frames_since_area_check < self.area_redetection_interval:
+            return
+
+        area = aruco_detection_result.get_four_marker_quadrilateral(self.testarea_corners)
+        if area is None:
+            return
+        self._frames_since_area_check = 0
 
+        transformer = self.testarea_position_transformer
+        if transformer is None or transformer.get_max_corner_distance(area) > self.area_drift_threshold:
+            self._set_area(area)
 
     def __init__(self,
-                 capture_device: cv2.VideoCapture,
+                 capture_device: Union[cv2.VideoCapture, FrameSource],
                  camera_undistortion_file: str,
                  testarea_corners: ArucoQuad,
                  real_testarea_size: Rectangle,
-                 newmarker_listener: NewMarkerListener = lambda marker: None):
+                 newmarker_listener: NewMarkerListener = lambda marker: None,
+                 threaded_capture: bool = True,
+                 detection_workers: int = 0,
+                 roi_tracking: bool = False,
+                 full_scan_interval: int = 15,
+                 roi_padding: float = 0.5,
+                 roi_max_area: float = 0.5,
+                 undistort_points_only: bool = False,
+                 area_file: Optional[str] = None,
+                 area_redetection_interval: int = 30,
+                 area_drift_threshold: float = 3.,
+                 detection_scale: float = 1.,
+                 aruco_parameter_file: Optional[str] = None,
+                 aruco_dictionary_file: Optional[str] = None,
+                 undistortion_cache_directory: Optional[str] = None):
+        """
+        Create a detection pipeline
+        :param capture_device: VideoCapture or FrameSource to retrieve frames from
+        :param camera_undistortion_file: Calibration file for the camera
+        :param testarea_corners: IDs of the markers marking the corners of the test area
+        :param real_testarea_size: The actual size of the test area in millimeters
+        :param newmarker_listener: Called when a new marker is found
+        :param threaded_capture: When True, a VideoCapture is read on a separate thread, and only the newest frame is
+        processed
+        :param detection_workers: When larger than 0, marker detection runs in this many worker processes. Pose
+        listeners are still called in frame order, but lag behind the capture by the amount of frames in flight. The
+        shown image lags by the same amount, so it always matches the markers drawn onto it
+        :param roi_tracking: When True, tracked markers are only searched for in a window around their predicted
+        position. Cannot be combined with detection_workers
+        :param full_scan_interval: When tracking regions of interest, the full frame is searched every this many frames,
+        to find new markers
+        :param roi_padding: Padding around the predicted position of a marker, relative to the marker's size
+        :param roi_max_area: When the windows around the tracked markers cover more than this fraction of the frame,
+        the full frame is searched instead, since searching many small windows is then slower than one full scan
+        :param undistort_points_only: When True, markers are detected in the distorted image, and only their corners
+        are undistorted. The undistorted image is then only created when undistorted_image or get_annotated_image is
+        used
+        :param area_file: File to store the detected test area in. When it exists at startup, the stored area is used
+        instead of searching for it
+        :param area_redetection_interval: The test area is detected again every this many frames
+        :param area_drift_threshold: Distance in pixels the corners of the test area need to move before the area is
+        replaced
+        :param detection_scale: When smaller than 1, markers are detected in a downscaled image and their corners are
+        refined at full resolution
+        :param aruco_parameter_file: Aruco detector parameter profile to use instead of OpenCV's defaults
+        :param aruco_dictionary_file: Marker dictionary (see MarkerDictionary) to detect markers from, instead of the
+        full original Aruco dictionary
+        :param undistortion_cache_directory: Directory to cache the undistortion maps in, see CameraUndistortion
+        """
+        super().__init__()
+        if roi_tracking and detection_workers > 0:
+            raise ValueError("Region of interest tracking cannot be combined with detection workers")
+
         # Attributes for camera feed
-        self.capture_device: cv2.VideoCapture = capture_device
+        if isinstance(capture_device, FrameSource):
+            self.frame_source: FrameSource = capture_device
+        elif threaded_capture:
+            self.frame_source = FrameGrabber(capture_device)
+        else:
+            self.frame_source = VideoCaptureSource(capture_device)
+        self.frame_timestamp = 0.
+        self.frame_number = 0
 
         # Attributes for camera undistortion
-        self.undistorted_image = None
-        self.camera_undistortion: CameraUndistortion = CameraUndistortion(camera_undistortion_file)
+        self.undistort_points_only = undistort_points_only
+        # Raw and undistorted image of the last processed frame, replaced as one snapshot, since the undistorted
+        # image may be created lazily on another thread (e.g. a stream) while the next frame is processed
+        self._frame_images: Tuple[Optional[np.ndarray], Optional[np.ndarray]] = (None, None)
+        self._frame_images_lock = threading.Lock()
+        # Held while the undistorted image is created lazily and copied for display. When only the marker corners are
+        # undistorted, the image is only undistorted for display, so it is written into one reused buffer
+        self._display_lock = threading.RLock()
+        self.last_detection_result: Optional[ArucoDetectionResult] = None
+        # Time in seconds spent detecting the markers of the last processed frame
+        self.last_detection_duration = 0.
+        self.camera_undistortion: CameraUndistortion = CameraUndistortion(camera_undistortion_file,
+                                                                         reuse_output=undistort_points_only,
+                                                                         cache_directory=undistortion_cache_directory)
 
         # Attributes for Aruco detection
-        self.aruco_detection: Aruco = Aruco()
+        self.aruco_detection: Aruco = Aruco(detection_scale=detection_scale, parameter_file=aruco_parameter_file,
+                                            dictionary_file=aruco_dictionary_file)
+        self.detection_scale = detection_scale
+        self.aruco_parameter_file = aruco_parameter_file
+        self.aruco_dictionary_file = aruco_dictionary_file
+        self.detection_workers = detection_workers
+        self.detection_pool: Optional[DetectionWorkerPool] = None
+        # Raw and undistorted image of each frame in flight in the worker pool, by frame number, so the image shown
+        # always belongs to the detection result drawn onto it
+        self._pending_images: Dict[int, Tuple[Optional[np.ndarray], Optional[np.ndarray]]] = dict()
         self.newmarker_listener = newmarker_listener
-        self.tracking: List[ArucoID] = []
+        self.tracking: Set[ArucoID] = set()
+
+        # Attributes for region of interest tracking
+        self.roi_tracking = roi_tracking
+        self.full_scan_interval = full_scan_interval
+        self.roi_padding = roi_padding
+        self.roi_max_area = roi_max_area
+        self._frames_since_full_scan = 0
+        self._marker_tracks: Dict[ArucoID, _MarkerTrack] = dict()
 
         # Attributes for Position Transform
         self.testarea_corners = testarea_corners
-        self.tracked_marker_transformed_quads = dict()
+        self._testarea_corner_ids: FrozenSet[ArucoID] = frozenset(testarea_corners)
         self.real_testarea_size = real_testarea_size
         self.testarea_position_transformer: Union[PositionTransformer, None] = None
-        self.pose_listeners: Dict[ArucoID, List[PoseListener]] = dict()
+        self.area_file = area_file
+        self.area_redetection_interval = area_redetection_interval
+        self.area_drift_threshold = area_drift_threshold
+        self._frames_since_area_check = 0
         self._setup_area()
 
-    def add_pose_listener(self, aruco_id: ArucoID, listener: PoseListener):
+    @property
+    def undistorted_image(self) -> Optional[np.ndarray]:
         """
-        Start listening to all position changes for a specific Aruco Marker
-        :param aruco_id: ID to start listening for
-        :param listener: Listener to call when the position changes
-        :return: None
-        """
-        if aruco_id not in self.pose_listeners:
-            self.pose_listeners[aruco_id] = []
-        self.pose_listeners[aruco_id].append(listener)
+        The undistorted version of the last processed frame, without any overlay.
 
-    def remove_pose_listeners_for_id(self, aruco_id: ArucoID):
+        When only the marker corners are undistorted, the image is undistorted the first time this property is accessed
+        for a frame. It is then written into a reused buffer, which is overwritten when the image of a later frame is
+        created, so copy it to keep it.
         """
-        Clear all pose listeners for a specific Aruco Marker ID
-        :param aruco_id: The ID to clear listeners for
-        :return: None
+        with self._frame_images_lock:
+            frame_images = self._frame_images
+        raw_image, undistorted_image = frame_images
+        if undistorted_image is None and raw_image is not None:
+            with self._display_lock:
+                undistorted_image = self.camera_undistortion.undistort(raw_image, True)
+                with self._frame_images_lock:
+                    # Only cache the result when no newer frame was processed in the meantime
+                    if self._frame_images is frame_images:
+                        self._frame_images = (raw_image, undistorted_image)
+        return undistorted_image
+
+    def get_annotated_image(self) -> Optional[np.ndarray]:
         """
-        self.pose_listeners[aruco_id] = []
+        Create a copy of the last undistorted frame, with the test area and all detected markers drawn onto it.
 
-    def remove_pose_listener(self, aruco_id: ArucoID, listener: PoseListener):
-        """
-        Stop calling a specific pose listener
-        :param aruco_id: ID the pose listener is registered to
-        :param listener: The specific listener
-        :return: None
+        Drawing is not part of process_next_frame, so only frames that are actually shown pay for it.
+        :return: The annotated image, or None if no frame was processed yet
         """
-        if aruco_id not in self.pose_listeners:
-            return
-        self.pose_listeners[aruco_id] = [lstnr for lstnr in self.pose_listeners[aruco_id] if not lstnr == listener]
+        detection_result = self.last_detection_result
+        with self._display_lock:
+            image = self.undistorted_image
+            if image is None:
+                return None
+            annotated_image = image.copy()
+
+        if self.testarea_position_transformer is not None:
+            self.testarea_position_transformer.quad.draw(annotated_image, (255,0,0))
+
+        if detection_result is not None:
+            for detected_id, detected_quad in detection_result.get_all():
+                detected_quad.draw(annotated_image, (255, 255, 255), False, str(detected_id))
+        return annotated_image
 
-    def _get_transformed_quad(self, marker_id: ArucoID, original_quad: Quadrilateral) -> Quadrilateral:
-        if marker_id not in self.tracked_marker_transformed_quads:
-            self.tracked_marker_transformed_quads[marker_id] = self.testarea_position_transformer.get_transformed_quad(
-                original_quad) if original_quad.is_valid() else original_quad
-        return self.tracked_marker_transformed_quads[marker_id]
+    def is_area_detected(self) -> bool:
+        """
+        Check if the test area was found
+        :return: True when poses can be calculated
+        """
+        return self.testarea_position_transformer is not None
 
     def process_next_frame(self):
         """
@@ -137,32 +313,171 @@ class ArucoDetectionPipeline:
         Calls pose listeners for any markers detected in the frame.
         :return:
         """
-        ret, original_image = self.capture_device.read()
-        if not ret:
+        with default_registry.time("capture"):
+            frame = self.frame_source.read_frame()
+        if frame is None:
             raise Exception("Error capturing image from video source")
 
-        self.tracked_marker_transformed_quads = dict()
-
-        self.undistorted_image = self.camera_undistortion.undistort(original_image, True)
+        if self.undistort_points_only:
+            raw_image, undistorted_image = frame.image, None
+            with default_registry.time("grayscale"):
+                detection_image = self.camera_undistortion.flip(cv2.cvtColor(frame.image, cv2.COLOR_BGR2GRAY))
+        else:
+            raw_image = None
+            with default_registry.time("undistort"):
+                undistorted_image = self.camera_undistortion.undistort(frame.image, True)
+            with default_registry.time("grayscale"):
+                detection_image = cv2.cvtColor(undistorted_image, cv2.COLOR_BGR2GRAY)
+
+        if self.detection_workers > 0:
+            if self.detection_pool is None:
+                self.detection_pool = DetectionWorkerPool(detection_image.shape, detection_image.dtype,
+                                                          self.detection_workers,
+                                                          detection_scale=self.detection_scale,
+                                                          parameter_file=self.aruco_parameter_file,
+                                                          dictionary_file=self.aruco_dictionary_file)
+            self._pending_images[frame.frame_number] = (raw_image, undistorted_image)
+            self.detection_pool.submit(detection_image, frame.frame_number, frame.timestamp)
+            self._process_work_results(self.detection_pool.get_results())
+        else:
+            with self._frame_images_lock:
+                self._frame_images = (raw_image, undistorted_image)
+            with default_registry.time("detect") as detect_timer:
+                detection_result = self._detect(detection_image, frame.timestamp)
+            self.last_detection_duration = detect_timer.duration
+            self._process_detection_result(self._undistort_detection_result(detection_result, detection_image.shape),
+                                           frame.frame_number, frame.timestamp)
+
+    def flush_detections(self):
+        """
+        Wait for all frames still in flight in the detection workers, and process their results.
 
-        aruco_detection_result = self.aruco_detection.process(self.undistorted_image)
+        Does nothing when detection does not run in worker processes.
+        :return:
+        """
+        if self.detection_pool is None:
+            return
+        while self.detection_pool.frames_in_flight > 0:
+            self._process_work_results(self.detection_pool.get_results(True))
+
+    def _process_work_results(self, work_results: List[DetectionWorkResult]):
+        errors = []
+        for work_result in work_results:
+            with self._frame_images_lock:
+                self._frame_images = self._pending_images.pop(work_result.frame_number)
+            if work_result.error is not None:
+                errors.append("frame %i: %s" % (work_result.frame_number, work_result.error))
+                continue
+            # Detection ran in a worker process, so its duration is recorded here
+            default_registry.record("detect", work_result.detection_duration)
+            self.last_detection_duration = work_result.detection_duration
+            self._process_detection_result(self._undistort_detection_result(work_result.detection_result,
+                                                                            self.detection_pool.frame_shape),
+                                           work_result.frame_number, work_result.timestamp)
+        if errors:
+            raise RuntimeError("Marker detection failed in a worker for %s" % ", ".join(errors))
+
+    def _undistort_detection_result(self, detection_result: ArucoDetectionResult,
+                                    image_shape: Tuple[int, ...]) -> ArucoDetectionResult:
+        if not self.undistort_points_only:
+            return detection_result
+        with default_registry.time("undistort"):
+            return detection_result.map_corners(lambda points: self.camera_undistortion.undistort_points(points,
+                                                                                                         image_shape))
+
+    def _detect(self, image: np.ndarray, timestamp: float) -> ArucoDetectionResult:
+        """
+        Detect markers in the image. When tracking regions of interest, only the windows around tracked markers are
+        searched, unless a full scan is due, the windows cover too much of the frame or one of the windows lost its
+        marker.
+        """
+        if self.roi_tracking and self._marker_tracks and self._frames_since_full_scan < self.full_scan_interval:
+            regions = self._predict_regions(image.shape, timestamp)
+            if sum(w * h for _, _, w, h in regions) <= self.roi_max_area * image.shape[0] * image.shape[1]:
+                self._frames_since_full_scan += 1
+                result = self.aruco_detection.process_regions(image, regions)
+                if all(result.contains(marker_id) for marker_id in self._marker_tracks):
+                    self._update_marker_tracks(result, timestamp)
+                    return result
+
+        self._frames_since_full_scan = 0
+        result = self.aruco_detection.process(image)
+        if self.roi_tracking:
+            self._update_marker_tracks(result, timestamp)
+        return result
+
+    def _predict_regions(self, image_shape: Tuple[int, ...], timestamp: float) -> List[Tuple[int, int, int, int]]:
+        height, width = image_shape[:2]
+        regions = []
+        for track in self._marker_tracks.values():
+            predicted_center = track.center_filter.predict(timestamp).position
+            corners = track.corners + (np.asarray(predicted_center) - track.corners.mean(axis=0))
+            top_left = corners.min(axis=0)
+            bottom_right = corners.max(axis=0)
+            padding = (bottom_right - top_left).max() * self.roi_padding
+
+            x_min, y_min = np.maximum((top_left - padding).astype(int), 0)
+            x_max, y_max = np.minimum((bottom_right + padding).astype(int), (width, height))
+            if x_max > x_min and y_max > y_min:
+                regions.append((x_min, y_min, x_max - x_min, y_max - y_min))
+        return _merge_regions(regions)
+
+    def _update_marker_tracks(self, detection_result: ArucoDetectionResult, timestamp: float):
+        tracks = dict()
+        for detected_id, corners in zip(detection_result.ids.tolist(), detection_result.corners):
+            if detected_id not in self.tracking:
+                continue
+
+            previous = self._marker_tracks.get(detected_id)
+            center_filter = previous.center_filter if previous is not None else AlphaBetaPoseFilter(0.8, 0.5)
+            center_x, center_y = corners.mean(axis=0).tolist()
+            center_filter.update(Pose((center_x, center_y), 0., timestamp))
+            tracks[detected_id] = _MarkerTrack(corners, center_filter)
+        self._marker_tracks = tracks
+
+    def _process_detection_result(self, aruco_detection_result: ArucoDetectionResult, frame_number: int,
+                                  timestamp: float):
+        self.frame_timestamp = timestamp
+        self.frame_number = frame_number
+
+        self.last_detection_result = aruco_detection_result
+        self._redetect_area(aruco_detection_result)
+
+        detected_ids = aruco_detection_result.ids.tolist()
+        new_ids = [detected_id for detected_id in detected_ids
+                   if detected_id not in self.tracking and detected_id not in self._testarea_corner_ids]
 
         if self.testarea_position_transformer is not None:
-            self.testarea_position_transformer.quad.draw(self.undistorted_image, (255,0,0))
-
-        for detected_id, detected_quad in aruco_detection_result.get_all():
-            detected_quad.draw(self.undistorted_image, (255, 255, 255), False, str(detected_id))
+            if self.frame_pose_listeners:
+                dispatched_ids = [detected_id for detected_id in detected_ids if detected_id in self.tracking]
+            else:
+                dispatched_ids = [detected_id for detected_id in detected_ids if detected_id in self.tracking
+                                  and detected_id in self.pose_listeners]
+            self._dispatch_poses(aruco_detection_result.subset(dispatched_ids))
+
+        for detected_id in new_ids:
+            self.newmarker_listener(detected_id)
+            self.tracking.add(detected_id)
+
+    def _dispatch_poses(self, tracked_markers: ArucoDetectionResult):
+        """
+        Calculate the poses of all tracked markers in one pass, then call their listeners
 
-            detected_id = int(detected_id)
-            if detected_id in self.tracking:
+        Frame pose listeners are called once, after all per-marker listeners, and also for frames without tracked markers.
+        """
+        with default_registry.time("transform"):
+            transformed_corners = self.testarea_position_transformer.transform_points(tracked_markers.corners)
+            xs, ys, angles = calculate_batch_poses(transformed_corners)
 
-                if detected_id in self.pose_listeners:
-                    for current_listener in self.pose_listeners[detected_id]:
-                        current_listener(self._get_transformed_quad(detected_id, detected_quad).get_pose())
+        poses: Dict[ArucoID, Pose] = dict()
+        with default_registry.time("dispatch"):
+            for marker_id, x, y, angle in zip(tracked_markers.ids.tolist(), xs.tolist(), ys.tolist(),
+                                              angles.tolist()):
+                pose = Pose((x, y), angle, self.frame_timestamp)
+                poses[marker_id] = pose
+                self._call_pose_listeners(marker_id, pose)
 
-            elif detected_id not in self.testarea_corners:
-                self.newmarker_listener(detected_id)
-                self.tracking.append(detected_id)
+            self._call_frame_pose_listeners(poses, self.frame_timestamp)
 
     def untrack(self, id: ArucoID):
         """
@@ -172,5 +487,16 @@ class ArucoDetectionPipeline:
         :param id: ID of the marker to stop tracking
         :return:
         """
-        if id in self.tracking:
-            self.tracking.remove(id)
+        self.tracking.discard(id)
+        self._marker_tracks.pop(id, None)
+
+    def release(self):
+        """
+        Release the frame source and stop all detection workers
+        :return:
+        """
+        self.frame_source.release()
+        if self.detection_pool is not None:
+            self.detection_pool.close()
+            self.detection_pool = None
+            self._pending_images.clear()
@@ -0,0 +1,101 @@
+#
+# Copyright (c) 2021. Niels Post. AI Lab Vrije Universiteit Brussel.
+#
+# This file is part of MP-Firm.
+#
+# MP-Firm is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MP-Firm is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MP-Firm.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+from typing import NewType, Callable, Dict, List
+
+from warehouse_pmsv_tracker.detection.aruco import ArucoID
+from warehouse_pmsv_tracker.util.shape import Pose
+
+# Called when the pose of a marker changes
+PoseListener = NewType('PoseListener', Callable[[Pose], None])
+
+# Called once per frame with the poses of all tracked markers in that frame, and the timestamp of the frame
+FramePoseListener = NewType('FramePoseListener', Callable[[Dict[ArucoID, Pose], float], None])
+
+
+class PoseListenerRegistry:
+    """
+    Keeps the pose listeners of each marker, for classes that hand out marker poses.
+    """
+
+    def __init__(self):
+        self.pose_listeners: Dict[ArucoID, List[PoseListener]] = dict()
+
+    def add_pose_listener(self, aruco_id: ArucoID, listener: PoseListener):
+        """
+        Start listening to all position changes for a specific Aruco Marker
+        :param aruco_id: ID to start listening for
+        :param listener: Listener to call when the position changes
+        :return: None
+        """
+        self.pose_listeners.setdefault(aruco_id, []).append(listener)
+
+    def remove_pose_listeners_for_id(self, aruco_id: ArucoID):
+        """
+        Clear all pose listeners for a specific Aruco Marker ID
+        :param aruco_id: The ID to clear listeners for
+        :return: None
+        """
+        self.pose_listeners[aruco_id] = []
+
+    def remove_pose_listener(self, aruco_id: ArucoID, listener: PoseListener):
+        """
+        Stop calling a specific pose listener
+        :param aruco_id: ID the pose listener is registered to
+        :param listener: The specific listener
+        :return: None
+        """
+        if aruco_id not in self.pose_listeners:
+            return
+        self.pose_listeners[aruco_id] = [lstnr for lstnr in self.pose_listeners[aruco_id] if not lstnr == listener]
+
+    def _call_pose_listeners(self, aruco_id: ArucoID, pose: Pose):
+        for listener in self.pose_listeners.get(aruco_id, ()):
+            listener(pose)
+
+
+class FramePoseListenerRegistry(PoseListenerRegistry):
+    """
+    Keeps the pose listeners of each marker, and the listeners for the poses of all markers in a frame.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.frame_pose_listeners: List[FramePoseListener] = []
+
+    def add_frame_pose_listener(self, listener: FramePoseListener):
+        """
+        Start listening to the poses of all tracked markers, once per processed frame
+        :param listener: Listener to call with a dictionary of poses by marker ID and the frame timestamp
+        :return: None
+        """
+        self.frame_pose_listeners.append(listener)
+
+    def remove_frame_pose_listener(self, listener: FramePoseListener):
+        """
+        Stop calling a specific frame pose listener
+        :param listener: The specific listener
+        :return: None
+        """
+        self.frame_pose_listeners = [lstnr for lstnr in self.frame_pose_listeners if not lstnr == listener]
+
+    def _call_frame_pose_listeners(self, poses: Dict[ArucoID, Pose], timestamp: float):
+        for listener in self.frame_pose_listeners:
+            listener(poses, timestamp)
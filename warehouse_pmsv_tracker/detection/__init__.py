@@ -18,6 +18,8 @@
 #
 
 
-from .ArucoDetectionPipeline import ArucoDetectionPipeline, NewMarkerListener, PoseListener
+from .PoseListenerRegistry import PoseListenerRegistry, FramePoseListenerRegistry, PoseListener, FramePoseListener
+from .ArucoDetectionPipeline import ArucoDetectionPipeline, NewMarkerListener
 
-__all__ = ["ArucoDetectionPipeline", "NewMarkerListener", "PoseListener"]
+__all__ = ["ArucoDetectionPipeline", "NewMarkerListener", "PoseListener", "FramePoseListener", "PoseListenerRegistry",
+           "FramePoseListenerRegistry"]
@@ -21,13 +21,15 @@
 # Type to represent Aruco IDs
 import os
 from itertools import product
-from typing import NewType, NamedTuple, Union, Iterable, List
+from typing import NewType, NamedTuple, Union, Iterable, List, Tuple, Callable, Dict, Optional
 
 import cv2
 import numpy as np
 from cv2 import aruco
 
-from warehouse_pmsv_tracker.util.shape import Quadrilateral
+from warehouse_pmsv_tracker.util.shape import Quadrilateral, calculate_batch_centroids, calculate_batch_directions, \
+    calculate_rescaled_pixel_points
+from .MarkerDictionary import MarkerDictionary
 
 ArucoID = NewType('ArucoID', int)
 
@@ -43,18 +45,53 @@ class ArucoQuad(NamedTuple):
 class ArucoDetectionResult:
     """
     A datatype containing information about a set of detected aruco_markers markers
+
+    The corners of all markers are stored in one contiguous (N, 4, 2) array, in topleft, topright, bottomleft,
+    bottomright order. An index from marker ID to row makes looking up a single marker O(1).
     """
 
-    def __init__(self, corners: List, ids: np.ndarray):
-        self.corners = corners
-        self.ids = ids
+    def __init__(self, corners: np.ndarray, ids: np.ndarray):
+        """
+        Create a detection result
+        :param corners: Array of shape (N, 4, 2) with the corners of each marker (topleft, topright, bottomleft,
+        bottomright)
+        :param ids: Array of shape (N,) with the ID of each marker
+        """
+        self.corners = np.ascontiguousarray(corners, dtype=np.float32).reshape(-1, 4, 2)
+        self.ids = np.asarray(ids, dtype=np.int32).reshape(-1)
+        self._index: Dict[int, int] = dict()
+        for row, marker_id in enumerate(self.ids.tolist()):
+            self._index.setdefault(marker_id, row)
+
+    @classmethod
+    def from_aruco(cls, corners: List[np.ndarray], ids: Optional[np.ndarray]) -> 'ArucoDetectionResult':
+        """
+        Create a detection result from the output of aruco.detectMarkers
+        :param corners: List of (1, 4, 2) corner arrays, in topleft, topright, bottomright, bottomleft order
+        :param ids: Array of IDs, or None when nothing was detected
+        :return: The detection result
+        """
+        if ids is None or len(corners) == 0:
+            return cls(np.empty((0, 4, 2), dtype=np.float32), np.empty(0, dtype=np.int32))
+        return cls(np.concatenate(corners).reshape(-1, 4, 2)[:, [0, 1, 3, 2]], ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def contains(self, marker: ArucoID) -> bool:
+        """
+        Check if a marker was detected
+        :param marker: ID of the marker
+        :return: True if the marker was detected
+        """
+        return int(marker) in self._index
 
     def get_all(self):
         """
         Retrieve the IDS and positions of the currently detected Aruco Markers
         :return:
         """
-        return zip(self.ids, self.get(self.ids.tolist()))
+        return zip(self.ids, (Quadrilateral(*corners) for corners in self.corners))
 
     def get(self, markers: Union[ArucoID, Iterable[ArucoID]]) -> Union[List[Quadrilateral], Quadrilateral]:
         """
@@ -67,8 +104,32 @@ class ArucoDetectionResult:
         """
         if isinstance(markers, list):
             return [self.get(marker) for marker in markers]
-        return Quadrilateral(*self.corners[np.where(self.ids == markers)[0][0]][0][[0, 1, 3, 2]]) if np.any(
-            self.ids == markers) else Quadrilateral(*[(0, 0)] * 4)
+        row = self._index.get(int(markers))
+        return Quadrilateral(*self.corners[row]) if row is not None else Quadrilateral(*[(0, 0)] * 4)
+
+    def subset(self, markers: Iterable[ArucoID]) -> 'ArucoDetectionResult':
+        """
+        Create a detection result containing only the given markers. Markers that were not detected are left out.
+        :param markers: IDs of the markers to keep
+        :return: A new ArucoDetectionResult
+        """
+        rows = [self._index[int(marker)] for marker in markers if int(marker) in self._index]
+        return ArucoDetectionResult(self.corners[rows], self.ids[rows])
+
+    def get_centers(self) -> np.ndarray:
+        """
+        Calculate the centers of all detected markers
+        :return: Array of shape (N, 2)
+        """
+        return calculate_batch_centroids(self.corners)
+
+    def get_angles(self) -> np.ndarray:
+        """
+        Calculate the direction of all detected markers, from the center of their bottom edge to the center of their top
+        edge.
+        :return: Array of shape (N,) with angles in degrees between 0 and 360
+        """
+        return calculate_batch_directions(self.corners)
 
     def get_four_marker_quadrilateral(self, quad_markers: ArucoQuad) -> Union[Quadrilateral, None]:
         """"
@@ -76,7 +137,7 @@ class ArucoDetectionResult:
 
             This method finds the outer corners of the 4 markers and returns a new quadrilateral of those corners
         """
-        if not all(np.isin(quad_markers, self.ids)): return None
+        if not all(self.contains(marker) for marker in quad_markers): return None
 
         bools = sorted(product([False, True], [True, False]), key=lambda x: x[1])
 
@@ -86,37 +147,176 @@ class ArucoDetectionResult:
 
         return Quadrilateral(*outer_corners)
 
+    def map_corners(self, mapping: Callable[[np.ndarray], np.ndarray]) -> 'ArucoDetectionResult':
+        """
+        Create a new detection result, with the corners of all markers passed through a mapping.
+
+        :param mapping: Function that receives all corners as an (N, 2) array, and returns the mapped (N, 2) array
+        :return: A new ArucoDetectionResult with the mapped corners
+        """
+        if len(self.ids) == 0:
+            return self
+        return ArucoDetectionResult(mapping(self.corners.reshape(-1, 2)), self.ids)
+
     def draw(self, image: np.ndarray):
         """
         Draw the detected markers onto an image
         :param image: Image to draw on
         :return:  None
         """
-        aruco.drawDetectedMarkers(image, self.corners, self.ids)
+        aruco.drawDetectedMarkers(image, list(self.corners[:, [0, 1, 3, 2]].reshape(-1, 1, 4, 2)),
+                                  self.ids.reshape(-1, 1))
+
+
+def _to_grayscale(image: np.ndarray) -> np.ndarray:
+    return image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+# Detector parameters that can be stored in a parameter profile, with their type
+DETECTOR_PARAMETERS: Dict[str, type] = {
+    "adaptiveThreshWinSizeMin": int,
+    "adaptiveThreshWinSizeMax": int,
+    "adaptiveThreshWinSizeStep": int,
+    "adaptiveThreshConstant": float,
+    "minMarkerPerimeterRate": float,
+    "maxMarkerPerimeterRate": float,
+    "polygonalApproxAccuracyRate": float,
+    "minCornerDistanceRate": float,
+    "minMarkerDistanceRate": float,
+    "minDistanceToBorder": int,
+    "perspectiveRemovePixelPerCell": int,
+    "perspectiveRemoveIgnoredMarginPerCell": float,
+    "maxErroneousBitsInBorderRate": float,
+    "errorCorrectionRate": float,
+    "cornerRefinementMethod": int,
+    "cornerRefinementWinSize": int,
+    "cornerRefinementMaxIterations": int,
+    "cornerRefinementMinAccuracy": float,
+}
 
 
 class Aruco:
 
-    def __init__(self, aruco_dict_id=aruco.DICT_ARUCO_ORIGINAL):
-        self.aruco_dict = aruco.Dictionary_get(aruco_dict_id)
+    def __init__(self, aruco_dict_id=aruco.DICT_ARUCO_ORIGINAL, detection_scale: float = 1.,
+                 refinement_window: int = 5, parameter_file: Optional[str] = None,
+                 dictionary_file: Optional[str] = None):
+        """
+        Create an Aruco detector
+
+        :param aruco_dict_id: Which Aruco Dictionary to detect markers from
+        :param detection_scale: When smaller than 1, markers are detected in an image downscaled by this factor, after
+        which their corners are refined to sub-pixel accuracy in the full resolution image
+        :param refinement_window: Half the size (in full resolution pixels) of the window that corners are refined in
+        :param parameter_file: Parameter profile (see save_parameters) to load the detector parameters from. When
+        None, OpenCV's default parameters are used
+        :param dictionary_file: Marker dictionary (see MarkerDictionary) to detect markers from. When given,
+        aruco_dict_id is ignored and detected markers are reported by their deployed ID
+        """
+        self.marker_dictionary: Optional[MarkerDictionary] = None
+        if dictionary_file is not None:
+            self.marker_dictionary = MarkerDictionary.load(dictionary_file)
+            self.aruco_dict = self.marker_dictionary.dictionary
+        else:
+            self.aruco_dict = aruco.Dictionary_get(aruco_dict_id)
         self.parameters = aruco.DetectorParameters_create()
+        if parameter_file is not None:
+            self.load_parameters(parameter_file)
+        self.detection_scale = detection_scale
+        self.refinement_window = refinement_window
+
+    def load_parameters(self, parameter_file: str) -> None:
+        """
+        Load detector parameters from a parameter profile. Parameters missing from the profile keep their value
+        :param parameter_file: File written by save_parameters
+        :return: None
+        """
+        fs = cv2.FileStorage(parameter_file, cv2.FILE_STORAGE_READ)
+        if not fs.isOpened():
+            raise FileNotFoundError("Cannot open Aruco parameter file %s" % parameter_file)
+        for name, parameter_type in DETECTOR_PARAMETERS.items():
+            node = fs.getNode(name)
+            if not node.empty():
+                setattr(self.parameters, name, parameter_type(node.real()))
+        fs.release()
+
+    def save_parameters(self, parameter_file: str) -> None:
+        """
+        Write the current detector parameters to a parameter profile
+        :param parameter_file: File to write to
+        :return: None
+        """
+        fs = cv2.FileStorage(parameter_file, cv2.FILE_STORAGE_WRITE)
+        for name, parameter_type in DETECTOR_PARAMETERS.items():
+            fs.write(name, parameter_type(getattr(self.parameters, name)))
+        fs.release()
 
     def process(self, image) -> ArucoDetectionResult:
         """
         Find all aruco_markers markers in an image.
 
+        :param image: A BGR or grayscale image
         :return: An ArucoDetectionResult containing all found markers
         """
 
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        return self._detect(_to_grayscale(image))
+
+    def process_regions(self, image, regions: Iterable[Tuple[int, int, int, int]]) -> ArucoDetectionResult:
+        """
+        Find aruco_markers markers only inside a set of regions of an image.
 
+        Corners are returned in the coordinates of the full image. When a marker is found in multiple (overlapping)
+        regions, it is only returned once.
+        :param image: The image to search in
+        :param regions: The regions to search, as (x, y, w, h) tuples
+        :return: An ArucoDetectionResult containing all found markers
+        """
+        corners = []
+        ids = []
+        found = set()
+        for x, y, w, h in regions:
+            region_result = self._detect(_to_grayscale(image[y:y + h, x:x + w]))
+
+            for marker_corners, marker_id in zip(region_result.corners, region_result.ids.tolist()):
+                if marker_id in found:
+                    continue
+                found.add(marker_id)
+                corners.append(marker_corners + (x, y))
+                ids.append(marker_id)
+
+        return ArucoDetectionResult(np.array(corners).reshape(-1, 4, 2), np.array(ids))
+
+    def _detect(self, gray: np.ndarray) -> ArucoDetectionResult:
+        if self.detection_scale >= 1:
+            return self._detect_markers(gray)
+
+        small = cv2.resize(gray, None, fx=self.detection_scale, fy=self.detection_scale, interpolation=cv2.INTER_AREA)
+        result = self._detect_markers(small)
+        if len(result) == 0:
+            return result
+        return result.map_corners(lambda points: self._refine_corners(gray, points))
+
+    def _detect_markers(self, gray: np.ndarray) -> ArucoDetectionResult:
         corners, ids, _ = aruco.detectMarkers(gray, self.aruco_dict, parameters=self.parameters)
-        ids = ids.flatten() if ids is not None else np.empty([0])
-        return ArucoDetectionResult(corners, ids)
+        if ids is not None and self.marker_dictionary is not None:
+            ids = self.marker_dictionary.to_marker_ids(ids)
+        return ArucoDetectionResult.from_aruco(corners, ids)
+
+    def _refine_corners(self, gray: np.ndarray, small_points: np.ndarray) -> np.ndarray:
+        """
+        Scale corners found in the downscaled image back to the full resolution image, and refine them there
+        :param gray: The full resolution image
+        :param small_points: Array of shape (N, 2) with corners in the downscaled image
+        :return: Array of shape (N, 2) with the refined corners in the full resolution image
+        """
+        points = calculate_rescaled_pixel_points(small_points, self.detection_scale).reshape(-1, 1, 2)
+        cv2.cornerSubPix(gray, points, (self.refinement_window, self.refinement_window), (-1, -1),
+                         (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_COUNT, 20, 0.01))
+        return points.reshape(-1, 2)
 
     @classmethod
     def generate_marker_pairs(cls, amount: int, output_directory: str, aruco_dict_id=aruco.DICT_ARUCO_ORIGINAL,
-                              x_offset=20, y_offset=20, big=True):
+                              x_offset=20, y_offset=20, big=True, dictionary_file: Optional[str] = None,
+                              marker_ids: Optional[Iterable[int]] = None):
         """
         Generate markers for printing
 
@@ -126,15 +326,30 @@ class Aruco:
         :param x_offset: Horizontal offset from the page edge for each markerea
         :param y_offset: Vertical offset from the page edge for each marker
         :param marker_size: Size of each marker in pixels
+        :param dictionary_file: Marker dictionary (see MarkerDictionary) to print markers from. When given, the first
+        amount deployed IDs of the dictionary are printed, and aruco_dict_id is ignored
+        :param marker_ids: When given, the markers with these IDs are printed instead of the first amount
         :return:
         """
-        aruco_dict = aruco.Dictionary_get(aruco_dict_id)
         marker_size = 500 if big else 250
         marker_count = 2 if big else 4
-        for i in range(0, amount, marker_count):
-            markers = [
-                aruco.drawMarker(aruco_dict, i + j, marker_size) for j in range(marker_count)
-            ]
+
+        if dictionary_file is not None:
+            marker_dictionary = MarkerDictionary.load(dictionary_file)
+            available_ids = marker_dictionary.get_ids()
+            draw_marker = marker_dictionary.draw_marker
+        else:
+            aruco_dict = aruco.Dictionary_get(aruco_dict_id)
+            available_ids = list(range(amount))
+            draw_marker = lambda marker_id, size: aruco.drawMarker(aruco_dict, marker_id, size)
+        marker_ids = list(marker_ids) if marker_ids is not None else available_ids[:amount]
+
+        for i in range(0, len(marker_ids), marker_count):
+            page_ids = marker_ids[i:i + marker_count]
+            markers = [draw_marker(marker_id, marker_size) for marker_id in page_ids]
+            # Leave unused spots on the last page blank
+            markers += [np.full((marker_size, marker_size), 255, dtype=np.uint8)] * (marker_count - len(markers))
+            file_name = os.path.join(output_directory, "aruco_%s.jpg" % "_".join(str(id) for id in page_ids))
 
             markers_a4 = np.zeros(
                 [marker_size * 2 + 4 * y_offset, marker_size * int(marker_count / 2) + x_offset * marker_count],
@@ -146,7 +361,7 @@ class Aruco:
                 markers_a4[y_offset:y_offset + marker_size, x_offset:x_offset + marker_size] = markers[0]
                 markers_a4[y_offset * 3 + marker_size:y_offset * 3 + marker_size * 2, x_offset:x_offset + marker_size] = \
                 markers[1]
-                cv2.imwrite(os.path.join(output_directory, "aruco_%i_%i.jpg") % (*[id for id in range(i, i+2)],), markers_a4)
+                cv2.imwrite(file_name, markers_a4)
 
 
             else:
@@ -157,6 +372,6 @@ class Aruco:
                 markers[2]
                 markers_a4[y_offset * 3 + marker_size:y_offset * 3 + marker_size * 2,
                 x_offset * 3 + marker_size: x_offset * 3 + marker_size * 2] = markers[3]
-                cv2.imwrite(os.path.join(output_directory, "aruco_%i_%i_%i_%i.jpg") % (*[id for id in range(i, i+4)],), markers_a4)
+                cv2.imwrite(file_name, markers_a4)
 
 
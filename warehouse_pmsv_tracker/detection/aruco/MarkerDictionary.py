@@ -0,0 +1,124 @@
+#
+# Copyright (c) 2021. Niels Post. AI Lab Vrije Universiteit Brussel.
+#
+# This file is part of MP-Firm.
+#
+# MP-Firm is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MP-Firm is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MP-Firm.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+from typing import Iterable, List
+
+import cv2
+import numpy as np
+from cv2 import aruco
+
+
+class MarkerDictionary:
+    """
+    A reduced Aruco dictionary, containing only the marker IDs that are actually deployed.
+
+    The markers are generated by OpenCV to maximise the distance between them, which makes decoding faster and error
+    correction stronger than with a large predefined dictionary. Since the generated dictionary numbers its markers
+    0..N-1, the deployed ID of every marker is stored alongside it.
+    """
+
+    def __init__(self, dictionary: 'aruco.Dictionary', marker_ids: Iterable[int]):
+        """
+        Wrap an Aruco dictionary
+        :param dictionary: The Aruco dictionary, containing one marker per deployed ID
+        :param marker_ids: The deployed ID of each marker in the dictionary, in dictionary order
+        """
+        self.dictionary = dictionary
+        self.marker_ids = np.asarray(list(marker_ids), dtype=np.int32)
+        if len(self.marker_ids) != len(dictionary.bytesList):
+            raise ValueError("Dictionary contains %i markers, but %i IDs were given"
+                             % (len(dictionary.bytesList), len(self.marker_ids)))
+        self._index = {marker_id: index for index, marker_id in enumerate(self.marker_ids.tolist())}
+
+    @classmethod
+    def create(cls, marker_ids: Iterable[int], marker_bits: int = 4, seed: int = 0) -> 'MarkerDictionary':
+        """
+        Generate a dictionary for a set of deployed marker IDs
+        :param marker_ids: The IDs to generate markers for
+        :param marker_bits: Size of the marker grid (excluding border) in bits. Fewer bits give larger cells, which can be
+        detected from further away, but leave less room for error correction
+        :param seed: Random seed for the marker generation, so the same dictionary can be generated again
+        :return: The generated dictionary
+        """
+        marker_ids = sorted(set(int(marker_id) for marker_id in marker_ids))
+        return cls(aruco.custom_dictionary(len(marker_ids), marker_bits, randomSeed=seed), marker_ids)
+
+    @classmethod
+    def load(cls, dictionary_file: str) -> 'MarkerDictionary':
+        """
+        Load a dictionary written by save
+        :param dictionary_file: File to load from
+        :return: The loaded dictionary
+        """
+        fs = cv2.FileStorage(dictionary_file, cv2.FILE_STORAGE_READ)
+        if not fs.isOpened():
+            raise FileNotFoundError("Cannot open marker dictionary file %s" % dictionary_file)
+        marker_bits = int(fs.getNode("marker_bits").real())
+        max_correction_bits = int(fs.getNode("max_correction_bits").real())
+        marker_ids = fs.getNode("marker_ids").mat().reshape(-1)
+        bytes_list = fs.getNode("bytes_list").mat()
+        fs.release()
+
+        dictionary = aruco.custom_dictionary(0, marker_bits)
+        dictionary.bytesList = np.ascontiguousarray(bytes_list, dtype=np.uint8).reshape(len(marker_ids), -1, 4)
+        dictionary.maxCorrectionBits = max_correction_bits
+        return cls(dictionary, marker_ids)
+
+    def save(self, dictionary_file: str) -> None:
+        """
+        Write the dictionary to a file
+        :param dictionary_file: File to write to
+        :return: None
+        """
+        fs = cv2.FileStorage(dictionary_file, cv2.FILE_STORAGE_WRITE)
+        fs.write("marker_bits", self.dictionary.markerSize)
+        fs.write("max_correction_bits", self.dictionary.maxCorrectionBits)
+        fs.write("marker_ids", self.marker_ids.reshape(-1, 1))
+        fs.write("bytes_list", self.dictionary.bytesList.reshape(len(self.marker_ids), -1))
+        fs.release()
+
+    def __len__(self):
+        return len(self.marker_ids)
+
+    def get_ids(self) -> List[int]:
+        """
+        Get the deployed IDs of all markers in the dictionary
+        :return: Sorted list of IDs
+        """
+        return self.marker_ids.tolist()
+
+    def to_marker_ids(self, indices: np.ndarray) -> np.ndarray:
+        """
+        Translate dictionary indices, as returned by aruco.detectMarkers, to deployed IDs
+        :param indices: Array of dictionary indices
+        :return: Array of deployed IDs, in the same shape
+        """
+        return self.marker_ids[np.asarray(indices, dtype=np.int64)]
+
+    def draw_marker(self, marker_id: int, size: int) -> np.ndarray:
+        """
+        Draw a marker for printing
+        :param marker_id: Deployed ID of the marker
+        :param size: Size of the image in pixels
+        :return: The marker image
+        """
+        if marker_id not in self._index:
+            raise KeyError("Marker ID %i is not part of this dictionary" % marker_id)
+        return aruco.drawMarker(self.dictionary, self._index[marker_id], size)
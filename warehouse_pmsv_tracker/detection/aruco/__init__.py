@@ -19,5 +19,6 @@
 
 
 from .Aruco import Aruco, ArucoDetectionResult, ArucoID, ArucoQuad
+from .MarkerDictionary import MarkerDictionary
 
-__all__ = ['Aruco', 'ArucoDetectionResult', 'ArucoID', 'ArucoQuad']
+__all__ = ['Aruco', 'ArucoDetectionResult', 'ArucoID', 'ArucoQuad', 'MarkerDictionary']
@@ -0,0 +1,144 @@
+#
+# Copyright (c) 2021. Niels Post. AI Lab Vrije Universiteit Brussel.
+#
+# This file is part of MP-Firm.
+#
+# MP-Firm is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MP-Firm is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MP-Firm.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+from cv2 import aruco
+
+from warehouse_pmsv_tracker.util.shape import calculate_rescaled_pixel_points
+
+# Corners of one view: object points of shape (N, 3) and the matching image points of shape (N, 2)
+ViewCorners = Tuple[np.ndarray, np.ndarray]
+
+
+class CalibrationPattern:
+    """
+    Base class for the patterns a camera can be calibrated with.
+
+    Patterns are sent to the processes corners are extracted in, so they should only hold picklable settings.
+    """
+
+    def find_corners(self, gray: np.ndarray) -> Optional[ViewCorners]:
+        """
+        Find the corners of the pattern in an image
+        :param gray: Grayscale image
+        :return: The object points (in the pattern's units) and image points of the found corners, or None when the
+        pattern was not found
+        """
+        raise NotImplementedError()
+
+    def draw(self, width: int) -> np.ndarray:
+        """
+        Draw the pattern for printing
+        :param width: Width of the image in pixels
+        :return: Grayscale image of the pattern
+        """
+        raise NotImplementedError()
+
+
+class ChessboardPattern(CalibrationPattern):
+    """
+    A regular chessboard. The complete board needs to be visible in a view for it to be used
+    """
+
+    def __init__(self, columns: int, rows: int, square_size: float, detection_width: int = 640):
+        """
+        Create a chessboard pattern
+        :param columns: Amount of inner corners in horizontal direction (one less than the amount of squares)
+        :param rows: Amount of inner corners in vertical direction
+        :param square_size: Size of a square, for example in millimeters
+        :param detection_width: Larger images are downscaled to this width to find the board, after which the corners
+        are refined in the full resolution image. Finding a board is slow in large images, especially when it is absent
+        """
+        self.columns = columns
+        self.rows = rows
+        self.square_size = square_size
+        self.detection_width = detection_width
+
+    def find_corners(self, gray: np.ndarray) -> Optional[ViewCorners]:
+        scale = min(1., self.detection_width / gray.shape[1])
+        small = gray if scale == 1 else cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        found, corners = cv2.findChessboardCorners(small, (self.columns, self.rows),
+                                                   flags=cv2.CALIB_CB_ADAPTIVE_THRESH | cv2.CALIB_CB_NORMALIZE_IMAGE |
+                                                         cv2.CALIB_CB_FAST_CHECK)
+        if not found:
+            return None
+
+        corners = calculate_rescaled_pixel_points(corners, scale)
+        cv2.cornerSubPix(gray, corners, (11, 11), (-1, -1),
+                         (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_COUNT, 30, 0.001))
+
+        object_points = np.zeros((self.rows * self.columns, 3), dtype=np.float32)
+        object_points[:, :2] = np.mgrid[0:self.columns, 0:self.rows].T.reshape(-1, 2) * self.square_size
+        return object_points, corners.reshape(-1, 2)
+
+    def draw(self, width: int) -> np.ndarray:
+        square = width // (self.columns + 1)
+        squares = np.indices((self.rows + 1, self.columns + 1)).sum(axis=0) % 2
+        return np.kron(squares, np.ones((square, square))).astype(np.uint8) * 255
+
+
+class CharucoPattern(CalibrationPattern):
+    """
+    A ChArUco board: a chessboard with Aruco markers in its white squares.
+
+    Since every corner can be identified by its neighbouring markers, the board does not need to be completely visible,
+    so views can also cover the corners of the image, where the distortion is strongest.
+    """
+
+    def __init__(self, columns: int, rows: int, square_size: float, marker_size: float,
+                 aruco_dict_id=aruco.DICT_4X4_50, min_corners: int = 6):
+        """
+        Create a ChArUco pattern
+        :param columns: Amount of squares in horizontal direction
+        :param rows: Amount of squares in vertical direction
+        :param square_size: Size of a square, for example in millimeters
+        :param marker_size: Size of the markers, in the same unit as square_size
+        :param aruco_dict_id: Which Aruco Dictionary the markers of the board are from
+        :param min_corners: Views with less corners found are not used
+        """
+        self.columns = columns
+        self.rows = rows
+        self.square_size = square_size
+        self.marker_size = marker_size
+        self.aruco_dict_id = aruco_dict_id
+        self.min_corners = min_corners
+
+    def _create_board(self):
+        # OpenCV boards cannot be pickled, so the board is created where it is used
+        return aruco.CharucoBoard_create(self.columns, self.rows, self.square_size, self.marker_size,
+                                         aruco.Dictionary_get(self.aruco_dict_id))
+
+    def find_corners(self, gray: np.ndarray) -> Optional[ViewCorners]:
+        board = self._create_board()
+        marker_corners, marker_ids, _ = aruco.detectMarkers(gray, aruco.Dictionary_get(self.aruco_dict_id))
+        if marker_ids is None:
+            return None
+
+        count, corners, ids = aruco.interpolateCornersCharuco(marker_corners, marker_ids, gray, board)
+        if not count or count < self.min_corners:
+            return None
+        return board.chessboardCorners[ids.reshape(-1)].astype(np.float32), corners.reshape(-1, 2)
+
+    def draw(self, width: int) -> np.ndarray:
+        height = int(width * self.rows / self.columns)
+        return self._create_board().draw((width, height))
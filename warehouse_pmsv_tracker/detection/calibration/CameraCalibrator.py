@@ -0,0 +1,193 @@
+#
+# Copyright (c) 2021. Niels Post. AI Lab Vrije Universiteit Brussel.
+#
+# This file is part of MP-Firm.
+#
+# MP-Firm is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MP-Firm is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MP-Firm.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import List, NamedTuple, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from warehouse_pmsv_tracker.detection.capture import FrameSource
+from .CalibrationPattern import CalibrationPattern, ViewCorners
+
+
+class CalibrationResult(NamedTuple):
+    """
+    The outcome of a camera calibration
+    """
+    camera_matrix: np.ndarray
+    distortion_coefficients: np.ndarray
+    # Size of the calibrated images, as (width, height)
+    image_size: Tuple[int, int]
+    # Root mean square distance in pixels between the found corners and the reprojected pattern, over all views
+    reprojection_error: float
+    # Reprojection error of each view that was used
+    view_errors: np.ndarray
+
+    def save(self, calibration_file: str) -> None:
+        """
+        Write the calibration to a file that can be loaded by CameraUndistortion
+        :param calibration_file: File to write to
+        :return: None
+        """
+        fs = cv2.FileStorage(calibration_file, cv2.FILE_STORAGE_WRITE)
+        fs.write("image_width", self.image_size[0])
+        fs.write("image_height", self.image_size[1])
+        fs.write("camera_matrix", self.camera_matrix)
+        fs.write("distortion_coefficients", self.distortion_coefficients)
+        fs.write("reprojection_error", self.reprojection_error)
+        fs.write("view_count", len(self.view_errors))
+        fs.release()
+
+
+class CameraCalibrator:
+    """
+    Calibrates a camera from views of a calibration pattern.
+
+    Finding the pattern is by far the slowest part of a calibration, so every view is handed to a process pool as soon
+    as it is added. Corners are therefore extracted while the next views are still being captured.
+
+    CameraUndistortion flips images before undistorting them, so by default views are flipped the same way before the
+    pattern is searched. The resulting calibration then matches the images CameraUndistortion works on.
+    """
+
+    def __init__(self, pattern: CalibrationPattern, flip_image: bool = True, workers: Optional[int] = None,
+                 max_views: int = 40):
+        """
+        Create a camera calibrator
+        :param pattern: The pattern visible in the views
+        :param flip_image: Should views be flipped? Must match the flip_image setting of CameraUndistortion
+        :param workers: Amount of processes to extract corners in, defaults to the amount of CPU cores
+        :param max_views: The calibration uses at most this many views, evenly spread over all views the pattern was
+        found in. Calibration time grows quickly with the amount of views, while the result hardly improves
+        """
+        self.pattern = pattern
+        self.flip_image = flip_image
+        self.max_views = max_views
+        self.image_size: Optional[Tuple[int, int]] = None
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        self._executor = ProcessPoolExecutor(self.workers)
+        self._views: List[Future] = []
+
+    def add_view(self, image: np.ndarray) -> None:
+        """
+        Add a view of the calibration pattern. Its corners are extracted in the background
+        :param image: BGR or grayscale image
+        :return: None
+        """
+        gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        if self.flip_image:
+            gray = cv2.flip(gray, 0)
+
+        h, w = gray.shape
+        if self.image_size is None:
+            self.image_size = (w, h)
+        elif self.image_size != (w, h):
+            raise ValueError("View has size %ix%i, but earlier views have size %ix%i" % (w, h, *self.image_size))
+
+        self._views.append(self._executor.submit(self.pattern.find_corners, gray))
+
+    @property
+    def view_count(self) -> int:
+        """
+        Amount of views that were added
+        """
+        return len(self._views)
+
+    @property
+    def found_view_count(self) -> int:
+        """
+        Amount of views the pattern was found in so far. Views that are still being processed are not counted
+        """
+        return sum(1 for view in self._views if view.done() and view.result() is not None)
+
+    def capture_views(self, frame_source: FrameSource, view_count: int, interval: float = 1.,
+                      verbose: bool = False) -> int:
+        """
+        Capture views from a frame source until the pattern was found in enough of them.
+
+        Move the pattern around between views, so it is seen at different positions, distances and angles.
+        :param frame_source: Source to capture views from
+        :param view_count: Amount of views the pattern should be found in
+        :param interval: Minimum amount of seconds between two views
+        :param verbose: When True, progress is printed
+        :return: Amount of views the pattern was found in. Can be less than view_count when the frame source ran out
+        """
+        last_capture = None
+        while self.found_view_count < view_count:
+            frame = frame_source.read_frame()
+            if frame is None:
+                break
+            if last_capture is not None and frame.timestamp - last_capture < interval:
+                continue
+            # Wait while the workers are busy, so no more views are captured than needed
+            pending = [view for view in self._views if not view.done()]
+            if len(pending) >= 2 * self.workers:
+                wait(pending, return_when=FIRST_COMPLETED)
+                if self.found_view_count >= view_count:
+                    break
+
+            last_capture = frame.timestamp
+            self.add_view(frame.image)
+            if verbose:
+                print("captured %i views, pattern found in %i" % (self.view_count, self.found_view_count))
+        return len(self._extract_corners())
+
+    def _extract_corners(self) -> List[ViewCorners]:
+        """
+        Wait until all views are processed
+        :return: The corners of the views the pattern was found in
+        """
+        return [corners for corners in (view.result() for view in self._views) if corners is not None]
+
+    def calibrate(self) -> CalibrationResult:
+        """
+        Calibrate the camera using the views the pattern was found in. Waits until all views are processed
+        :return: The calibration
+        """
+        views = self._extract_corners()
+        if len(views) < 3:
+            raise ValueError("The pattern was found in %i of %i views, at least 3 are needed"
+                             % (len(views), self.view_count))
+        if len(views) > self.max_views:
+            views = [views[int(i)] for i in np.linspace(0, len(views) - 1, self.max_views)]
+
+        object_points = [object_points for object_points, _ in views]
+        image_points = [image_points.reshape(-1, 1, 2) for _, image_points in views]
+        error, camera_matrix, distortion_coefficients, rotations, translations = cv2.calibrateCamera(
+            object_points, image_points, self.image_size, None, None)
+
+        view_errors = np.array([
+            np.sqrt(np.mean(np.sum((cv2.projectPoints(view_object_points, rotation, translation, camera_matrix,
+                                                      distortion_coefficients)[0] - view_image_points) ** 2, axis=-1)))
+            for view_object_points, view_image_points, rotation, translation
+            in zip(object_points, image_points, rotations, translations)
+        ])
+        return CalibrationResult(camera_matrix, distortion_coefficients, self.image_size, error, view_errors)
+
+    def release(self) -> None:
+        """
+        Stop the corner extraction processes
+        :return: None
+        """
+        for view in self._views:
+            view.cancel()
+        self._executor.shutdown()
@@ -18,6 +18,12 @@
 #
 
 
+import hashlib
+import os
+import shutil
+import tempfile
+from typing import Dict, Tuple, Optional
+
 import cv2
 
 import numpy as np
@@ -28,50 +34,188 @@ class CameraUndistortion:
 
     CameraUndistortion tries to remove both radial and tangential distortion.
     It can also flip the camera image, since webcam hardware often flips the image once in advance.
+
+    Flipping, undistortion and cropping are combined into a single precomputed remap table, so undistorting a frame
+    takes exactly one pass over the image.
+
+    Computing the remap tables is slow on small devices. When a cache directory is given, the tables are stored there
+    and memory-mapped on the next start, so a restart (or another process using the same camera) does not compute
+    them again.
     """
 
-    def __init__(self, calibration_file: str, flip_image: bool = True):
+    def __init__(self, calibration_file: str, flip_image: bool = True, fixed_point_maps: bool = True,
+                 reuse_output: bool = False, cache_directory: Optional[str] = None):
         """
         Create a CameraUndistortion
 
         :param calibration_file: Relative (from the working directory) path to a calibration file for the connected camera
         :param flip_image: Should the image be flipped?
+        :param fixed_point_maps: When True, the remap tables are stored as fixed point (CV_16SC2) maps, which are
+        faster to apply, at the cost of 1/32 pixel interpolation precision
+        :param reuse_output: When True, undistort writes into the same output buffer each call. The previously
+        returned image is overwritten by the next call
+        :param cache_directory: Directory to cache the remap tables in. The cache is keyed by the contents of the
+        calibration file, the image size and the flip and fixed point settings, so stale tables are never used
         """
         fs = cv2.FileStorage(calibration_file, cv2.FILE_STORAGE_READ)
         self.flip_image = flip_image
+        self.fixed_point_maps = fixed_point_maps
+        self.reuse_output = reuse_output
+        self.cache_directory = cache_directory
+        self._calibration_hash = None
+        if cache_directory is not None:
+            with open(calibration_file, "rb") as calibration:
+                self._calibration_hash = hashlib.sha1(calibration.read()).hexdigest()
         self._camera_matrix = fs.getNode("camera_matrix").mat()
         self._distortion_coefficients = fs.getNode("distortion_coefficients").mat()
         self._new_camera_matrix = None
+        self._image_size = (0, 0)
         self._region_of_interest = (0, 0, 0, 0)
-        self._map_x = self._map_y = None
+        self._maps: Dict[bool, Tuple[np.ndarray, np.ndarray]] = dict()
+        self._output_buffers: Dict[bool, np.ndarray] = dict()
 
     def _init(self, image):
         h, w = image.shape[:2]
+        self._image_size = (w, h)
+        self._maps = dict()
+        self._output_buffers = dict()
+
+        cache_path = self._cache_path()
+        if cache_path is not None and os.path.isdir(cache_path):
+            self._new_camera_matrix = np.load(os.path.join(cache_path, "new_camera_matrix.npy"))
+            self._region_of_interest = tuple(int(value) for value in
+                                             np.load(os.path.join(cache_path, "region_of_interest.npy")))
+            return
+
         self._new_camera_matrix, self._region_of_interest = cv2.getOptimalNewCameraMatrix(self._camera_matrix,
                                                                                           self._distortion_coefficients,
                                                                                           (w, h), 1,
                                                                                           (w, h))
 
-        self._map_x, self._map_y = cv2.initUndistortRectifyMap(self._camera_matrix, self._distortion_coefficients, None,
-                                                               self._new_camera_matrix, (w, h), cv2.CV_32FC1)
+    def _cache_path(self) -> Optional[str]:
+        """
+        Get the directory the remap tables for the current image size are cached in
+        :return: The directory, or None when caching is disabled
+        """
+        if self.cache_directory is None:
+            return None
+        w, h = self._image_size
+        key = "%s_%ix%i_%s_%s" % (self._calibration_hash, w, h, "flip" if self.flip_image else "noflip",
+                                  "fixed" if self.fixed_point_maps else "float")
+        return os.path.join(self.cache_directory, key)
+
+    def _init_maps(self):
+        cache_path = self._cache_path()
+        if cache_path is not None and os.path.isdir(cache_path):
+            self._maps = {
+                crop: tuple(np.load(os.path.join(cache_path, "%s_map_%i.npy" % (name, i)), mmap_mode="r")
+                            for i in (1, 2))
+                for crop, name in ((False, "full"), (True, "roi"))
+            }
+            return
+
+        self._compute_maps()
+        if cache_path is not None:
+            self._write_cache(cache_path)
 
-    def undistort(self, image, crop_region_of_interest: bool = True) -> np.ndarray:
+    def _write_cache(self, cache_path: str):
+        """
+        Store the remap tables in the cache.
+
+        The files are written to a temporary directory, which is then renamed into place. Other processes therefore
+        either see the complete cache entry, or none at all.
+        """
+        try:
+            os.makedirs(self.cache_directory, exist_ok=True)
+            temporary_path = tempfile.mkdtemp(dir=self.cache_directory, prefix=".tmp_")
+        except OSError:
+            return
+
+        try:
+            np.save(os.path.join(temporary_path, "new_camera_matrix.npy"), self._new_camera_matrix)
+            np.save(os.path.join(temporary_path, "region_of_interest.npy"), np.array(self._region_of_interest))
+            for crop, name in ((False, "full"), (True, "roi")):
+                for i, table in enumerate(self._maps[crop], 1):
+                    np.save(os.path.join(temporary_path, "%s_map_%i.npy" % (name, i)), table)
+            os.rename(temporary_path, cache_path)
+        except OSError:
+            # Another process stored the same entry first, or the cache is full. The computed tables are used either way
+            shutil.rmtree(temporary_path, ignore_errors=True)
+
+    def _compute_maps(self):
+        w, h = self._image_size
+        map_x, map_y = cv2.initUndistortRectifyMap(self._camera_matrix, self._distortion_coefficients, None,
+                                                   self._new_camera_matrix, (w, h), cv2.CV_32FC1)
+
+        # Flipping the input vertically before remapping is the same as sampling from the mirrored row
+        if self.flip_image:
+            map_y = (h - 1) - map_y
+
+        x, y, roi_w, roi_h = self._region_of_interest
+        self._maps = {
+            False: self._convert_maps(map_x, map_y),
+            True: self._convert_maps(map_x[y:y + roi_h, x:x + roi_w], map_y[y:y + roi_h, x:x + roi_w])
+        }
+
+    def _convert_maps(self, map_x: np.ndarray, map_y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        map_x = np.ascontiguousarray(map_x)
+        map_y = np.ascontiguousarray(map_y)
+        if self.fixed_point_maps:
+            return cv2.convertMaps(map_x, map_y, cv2.CV_16SC2)
+        return map_x, map_y
+
+    def undistort(self, image, crop_region_of_interest: bool = True, output: Optional[np.ndarray] = None) -> np.ndarray:
         """
         Get an undistorted (and possibly flipped) copy of a given image
         :param image: The image to undistort
         :param crop_region_of_interest: When true, the output image is cropped to its region of interest
+        :param output: Optional image to write the result into, must match the output size and type
         :return:
         """
         if self._new_camera_matrix is None:
             self._init(image)
+        if not self._maps:
+            self._init_maps()
 
-        output = image.copy()
-        if self.flip_image:
-            output = cv2.flip(output, 0)
-        output = cv2.remap(output, self._map_x, self._map_y, cv2.INTER_LINEAR)
+        if output is None and self.reuse_output:
+            output = self._output_buffers.get(crop_region_of_interest)
 
-        if crop_region_of_interest:
-            x, y, w, h = self._region_of_interest
-            output = output[y:y + h, x:x + w]
+        map_1, map_2 = self._maps[crop_region_of_interest]
+        output = cv2.remap(image, map_1, map_2, cv2.INTER_LINEAR, dst=output)
+
+        if self.reuse_output:
+            self._output_buffers[crop_region_of_interest] = output
 
         return output
+
+    def flip(self, image: np.ndarray) -> np.ndarray:
+        """
+        Apply only the flip of the undistortion to an image.
+
+        Can be used to detect markers without undistorting the full image. The detected points can then be undistorted
+        using undistort_points.
+        :param image: The image to flip
+        :return: The flipped image, or the image itself if flipping is disabled
+        """
+        return cv2.flip(image, 0) if self.flip_image else image
+
+    def undistort_points(self, points: np.ndarray, image_shape: Tuple[int, ...],
+                         crop_region_of_interest: bool = True) -> np.ndarray:
+        """
+        Map points in a flipped (but still distorted) image to their location in the undistorted image
+        :param points: Array of points, with shape (..., 2)
+        :param image_shape: Shape of the image the points were found in
+        :param crop_region_of_interest: When true, the points are mapped to the image cropped to its region of interest
+        :return: Array of the undistorted points, in the same shape as points
+        """
+        if self._new_camera_matrix is None:
+            self._init(np.empty(image_shape[:2], dtype=np.uint8))
+
+        undistorted = cv2.undistortPoints(np.asarray(points, dtype=np.float64).reshape(-1, 1, 2),
+                                          self._camera_matrix, self._distortion_coefficients,
+                                          P=self._new_camera_matrix).reshape(np.shape(points))
+
+        if crop_region_of_interest:
+            x, y, _, _ = self._region_of_interest
+            undistorted -= (x, y)
+        return undistorted
@@ -19,5 +19,8 @@
 
 
 from .CameraUndistortion import CameraUndistortion
+from .CalibrationPattern import CalibrationPattern, ChessboardPattern, CharucoPattern, ViewCorners
+from .CameraCalibrator import CameraCalibrator, CalibrationResult
 
-__all__ = ["CameraUndistortion"]
+__all__ = ["CameraUndistortion", "CalibrationPattern", "ChessboardPattern", "CharucoPattern", "ViewCorners",
+           "CameraCalibrator", "CalibrationResult"]
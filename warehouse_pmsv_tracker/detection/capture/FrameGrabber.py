@@ -0,0 +1,107 @@
+#
+# Copyright (c) 2021. Niels Post. AI Lab Vrije Universiteit Brussel.
+#
+# This file is part of MP-Firm.
+#
+# MP-Firm is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MP-Firm is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MP-Firm.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+import threading
+import time
+from typing import Optional
+
+import cv2
+
+from .FrameSource import FrameSource, CapturedFrame
+
+
+class FrameGrabber(FrameSource):
+    """
+    Threaded FrameSource that continuously empties the camera's buffer.
+
+    A background thread keeps reading from the capture device, and only the newest frame is kept. When the consumer
+    is slower than the camera, older frames are overwritten and counted as dropped. This keeps the age of every
+    processed frame bounded by the duration of one camera frame, regardless of how long processing takes.
+    """
+
+    def __init__(self, capture_device: cv2.VideoCapture, read_timeout: float = 1.0):
+        """
+        Create a FrameGrabber and start its capture thread
+        :param capture_device: Capture device to read from
+        :param read_timeout: Maximum time in seconds read_frame waits for a new frame
+        """
+        self.capture_device = capture_device
+        self.read_timeout = read_timeout
+
+        self.frames_captured = 0
+        self.frames_dropped = 0
+        self.capture_failures = 0
+
+        self._latest: Optional[CapturedFrame] = None
+        self._last_consumed_number = 0
+        self._condition = threading.Condition()
+        self._running = True
+        self._thread = threading.Thread(target=self._capture_loop, name="FrameGrabber", daemon=True)
+        self._thread.start()
+
+    def _capture_loop(self):
+        while self._running:
+            success, image = self.capture_device.read()
+            timestamp = time.time()
+
+            if not success:
+                self.capture_failures += 1
+                time.sleep(0.01)
+                continue
+
+            with self._condition:
+                self.frames_captured += 1
+                if self._latest is not None and self._latest.frame_number > self._last_consumed_number:
+                    self.frames_dropped += 1
+                self._latest = CapturedFrame(image, timestamp, self.frames_captured)
+                self._condition.notify_all()
+
+    def read_frame(self) -> Optional[CapturedFrame]:
+        """
+        Retrieve the newest frame that was not handed out before.
+
+        Blocks until such a frame is available, or until the read timeout expires.
+        :return: The newest frame, or None on timeout
+        """
+        with self._condition:
+            if not self._condition.wait_for(self._has_new_frame, self.read_timeout):
+                return None
+            self._last_consumed_number = self._latest.frame_number
+            return self._latest
+
+    def peek_frame(self) -> Optional[CapturedFrame]:
+        """
+        Retrieve the newest frame without marking it as consumed
+        :return: The newest frame, or None if no frame was captured yet
+        """
+        with self._condition:
+            return self._latest
+
+    def _has_new_frame(self) -> bool:
+        return self._latest is not None and self._latest.frame_number > self._last_consumed_number
+
+    def release(self) -> None:
+        """
+        Stop the capture thread and release the capture device
+        :return: None
+        """
+        self._running = False
+        self._thread.join(self.read_timeout)
+        self.capture_device.release()
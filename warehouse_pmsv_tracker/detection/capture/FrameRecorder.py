@@ -0,0 +1,107 @@
+#
+# Copyright (c) 2021. Niels Post. AI Lab Vrije Universiteit Brussel.
+#
+# This file is part of MP-Firm.
+#
+# MP-Firm is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MP-Firm is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MP-Firm.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+import os
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .FrameSource import FrameSource, CapturedFrame
+
+# Names of the files inside a recording directory
+FRAMES_FILE = "frames.raw"
+TIMESTAMPS_FILE = "timestamps.raw"
+METADATA_FILE = "recording.yaml"
+
+
+class FrameRecorder(FrameSource):
+    """
+    Records frames to a directory, so a session can be replayed later using a ReplayCapture.
+
+    Frames are appended uncompressed to one raw file, and their capture timestamps (float64) to another. Because every
+    frame has the same size, the recording can be memory mapped when it is replayed. The frame shape and type are
+    written to a small YAML file when the first frame is recorded.
+
+    A FrameRecorder can wrap another FrameSource, in which case every frame read through the recorder is recorded.
+    Frames can also be recorded directly using write().
+    """
+
+    def __init__(self, output_directory: str, frame_source: Optional[FrameSource] = None):
+        """
+        Create a recording. An existing recording in the output directory is overwritten.
+        :param output_directory: Directory to write the recording to. Created when it does not exist
+        :param frame_source: Source to record frames from when read_frame is called, or None to only record frames
+        passed to write()
+        """
+        os.makedirs(output_directory, exist_ok=True)
+        self.output_directory = output_directory
+        self.frame_source = frame_source
+        self.frames_recorded = 0
+
+        self._frame_shape: Optional[Tuple[int, ...]] = None
+        self._frames_file = open(os.path.join(output_directory, FRAMES_FILE), "wb")
+        self._timestamps_file = open(os.path.join(output_directory, TIMESTAMPS_FILE), "wb")
+
+    def _write_metadata(self, image: np.ndarray):
+        fs = cv2.FileStorage(os.path.join(self.output_directory, METADATA_FILE), cv2.FILE_STORAGE_WRITE)
+        fs.write("image_height", image.shape[0])
+        fs.write("image_width", image.shape[1])
+        fs.write("channels", 1 if image.ndim == 2 else image.shape[2])
+        fs.write("dtype", image.dtype.name)
+        fs.release()
+
+    def write(self, frame: CapturedFrame) -> None:
+        """
+        Append a frame to the recording
+        :param frame: The frame to record. All frames in a recording should have the same shape and type
+        :return: None
+        """
+        if self._frame_shape is None:
+            self._frame_shape = frame.image.shape
+            self._write_metadata(frame.image)
+        elif frame.image.shape != self._frame_shape:
+            raise ValueError("Frame shape %s differs from the recording's frame shape %s"
+                             % (frame.image.shape, self._frame_shape))
+
+        np.ascontiguousarray(frame.image).tofile(self._frames_file)
+        np.array([frame.timestamp], dtype=np.float64).tofile(self._timestamps_file)
+        self.frames_recorded += 1
+
+    def read_frame(self) -> Optional[CapturedFrame]:
+        """
+        Retrieve the next frame from the wrapped frame source, and record it
+        :return: The next frame, or None when no frame could be retrieved
+        """
+        frame = self.frame_source.read_frame()
+        if frame is not None:
+            self.write(frame)
+        return frame
+
+    def release(self) -> None:
+        """
+        Finish the recording, and release the wrapped frame source
+        :return: None
+        """
+        if not self._frames_file.closed:
+            self._frames_file.close()
+            self._timestamps_file.close()
+        if self.frame_source is not None:
+            self.frame_source.release()
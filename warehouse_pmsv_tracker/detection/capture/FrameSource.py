@@ -0,0 +1,86 @@
+#
+# Copyright (c) 2021. Niels Post. AI Lab Vrije Universiteit Brussel.
+#
+# This file is part of MP-Firm.
+#
+# MP-Firm is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MP-Firm is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MP-Firm.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+import time
+from typing import NamedTuple, Optional
+
+import cv2
+import numpy as np
+
+
+class CapturedFrame(NamedTuple):
+    """
+    A single frame retrieved from a camera, together with the moment it was captured
+    """
+    image: np.ndarray
+    timestamp: float
+    frame_number: int
+
+
+class FrameSource:
+    """
+    Base class for everything the detection pipeline can retrieve frames from.
+
+    A FrameSource hands out CapturedFrames instead of bare images, so the rest of the pipeline knows how old a frame is.
+    """
+
+    def read_frame(self) -> Optional[CapturedFrame]:
+        """
+        Retrieve the next frame
+        :return: The next frame, or None when no frame could be retrieved
+        """
+        raise NotImplementedError()
+
+    def read(self):
+        """
+        cv2.VideoCapture compatible read
+        :return: A tuple (success, image)
+        """
+        frame = self.read_frame()
+        if frame is None:
+            return False, None
+        return True, frame.image
+
+    def release(self) -> None:
+        """
+        Release the underlying capture device
+        :return: None
+        """
+        pass
+
+
+class VideoCaptureSource(FrameSource):
+    """
+    Synchronous FrameSource, reading directly from a cv2.VideoCapture whenever a frame is requested
+    """
+
+    def __init__(self, capture_device: cv2.VideoCapture):
+        self.capture_device = capture_device
+        self._frame_number = 0
+
+    def read_frame(self) -> Optional[CapturedFrame]:
+        success, image = self.capture_device.read()
+        if not success:
+            return None
+        self._frame_number += 1
+        return CapturedFrame(image, time.time(), self._frame_number)
+
+    def release(self) -> None:
+        self.capture_device.release()
@@ -0,0 +1,146 @@
+#
+# Copyright (c) 2021. Niels Post. AI Lab Vrije Universiteit Brussel.
+#
+# This file is part of MP-Firm.
+#
+# MP-Firm is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MP-Firm is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MP-Firm.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+import os
+import time
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from .FrameRecorder import FRAMES_FILE, TIMESTAMPS_FILE, METADATA_FILE
+from .FrameSource import FrameSource, CapturedFrame
+
+
+class ReplayCapture(FrameSource):
+    """
+    FrameSource that plays back a recording made by a FrameRecorder.
+
+    The recording is memory mapped, so replaying does not load the whole session into memory.
+
+    In real time mode, frames become available at the moment they were captured relative to the start of the replay.
+    When the consumer is slower than the recording, older frames are skipped and counted as dropped, the same way a
+    FrameGrabber behaves with a live camera. Otherwise, every frame is returned in order, as fast as it is requested.
+
+    Frames keep the timestamps and frame numbers of the recording, so the results of a replay do not depend on how fast
+    it ran. When looping, each pass is shifted by the length of the recording, so timestamps and frame numbers keep
+    increasing like they would for a live camera.
+    """
+
+    def __init__(self, recording_directory: str, real_time: bool = False, loop: bool = False):
+        """
+        Open a recording
+        :param recording_directory: Directory the recording was written to
+        :param real_time: When True, frames are played back at the speed they were recorded at
+        :param loop: When True, the recording restarts after the last frame. Otherwise read_frame returns None
+        """
+        fs = cv2.FileStorage(os.path.join(recording_directory, METADATA_FILE), cv2.FILE_STORAGE_READ)
+        if not fs.isOpened():
+            raise FileNotFoundError("No recording found in %s" % recording_directory)
+        height = int(fs.getNode("image_height").real())
+        width = int(fs.getNode("image_width").real())
+        channels = int(fs.getNode("channels").real())
+        dtype = np.dtype(fs.getNode("dtype").string())
+        fs.release()
+
+        frame_shape = (height, width) if channels == 1 else (height, width, channels)
+        frame_size = int(np.prod(frame_shape)) * dtype.itemsize
+
+        # A recording that was not finished properly can end with a partially written frame or timestamp
+        frames_path = os.path.join(recording_directory, FRAMES_FILE)
+        timestamps_path = os.path.join(recording_directory, TIMESTAMPS_FILE)
+        frame_count = min(os.path.getsize(frames_path) // frame_size, os.path.getsize(timestamps_path) // 8)
+        if frame_count == 0:
+            raise ValueError("Recording in %s does not contain any frames" % recording_directory)
+
+        # Copy-on-write, so consumers that draw on a frame do not modify the recording
+        self.frames = np.memmap(frames_path, dtype=dtype, mode="c", shape=(frame_count,) + frame_shape)
+        self.timestamps = np.fromfile(timestamps_path, dtype=np.float64, count=frame_count)
+
+        self.real_time = real_time
+        self.loop = loop
+        self.frames_dropped = 0
+
+        # Length of one pass, including the interval between the last frame and the first frame of the next pass
+        frame_interval = (self.timestamps[-1] - self.timestamps[0]) / (frame_count - 1) if frame_count > 1 else 0.
+        self._loop_duration = float(self.timestamps[-1] - self.timestamps[0] + (frame_interval or 1.))
+        self._loop_count = 0
+
+        self._next_index = 0
+        self._replay_start: Optional[float] = None
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def _due_index(self) -> int:
+        """
+        Find the newest frame that should be available by now in real time mode, waiting for the next frame if it was
+        not captured yet.
+        :return: Index of the frame to return
+        """
+        now = time.time()
+        if self._replay_start is None:
+            self._replay_start = now - (self.timestamps[self._next_index] - self.timestamps[0])
+
+        recording_time = self.timestamps[0] + (now - self._replay_start)
+        due_index = int(np.searchsorted(self.timestamps, recording_time, "right")) - 1
+
+        if due_index < self._next_index:
+            time.sleep(max(0., self.timestamps[self._next_index] - recording_time))
+            return self._next_index
+
+        self.frames_dropped += due_index - self._next_index
+        return due_index
+
+    def read_frame(self) -> Optional[CapturedFrame]:
+        """
+        Retrieve the next frame of the recording
+        :return: The next frame, or None when the end of the recording was reached
+        """
+        if self._next_index >= len(self.timestamps):
+            if not self.loop:
+                return None
+            self._next_index = 0
+            self._replay_start = None
+            self._loop_count += 1
+
+        index = self._due_index() if self.real_time else self._next_index
+        self._next_index = index + 1
+
+        return CapturedFrame(self.frames[index], float(self.timestamps[index]) + self._loop_count * self._loop_duration,
+                             self._loop_count * len(self.timestamps) + index + 1)
+
+    def rewind(self) -> None:
+        """
+        Restart the replay at the first frame, with the timestamps and frame numbers of the recording
+        :return: None
+        """
+        self._next_index = 0
+        self._replay_start = None
+        self._loop_count = 0
+
+    def release(self) -> None:
+        """
+        Close the memory mapped recording. Afterwards, read_frame always returns None
+        :return: None
+        """
+        self.frames = np.empty((0,) + self.frames.shape[1:], dtype=self.frames.dtype)
+        self.timestamps = self.timestamps[:0]
+        self.loop = False
@@ -0,0 +1,108 @@
+#
+# Copyright (c) 2021. Niels Post. AI Lab Vrije Universiteit Brussel.
+#
+# This file is part of MP-Firm.
+#
+# MP-Firm is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MP-Firm is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MP-Firm.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+import time
+from typing import Optional
+
+import numpy as np
+
+from warehouse_pmsv_tracker.util.shape import Pose
+
+
+class AlphaBetaPoseFilter:
+    """
+    Constant velocity (alpha-beta) filter for the pose of a single marker.
+
+    The filter keeps an estimate of the position, angle and their velocities. Each measurement corrects the estimate
+    with a fixed gain: alpha for the pose itself, and beta for the velocity. Between measurements, the pose can be
+    predicted for any timestamp.
+    """
+
+    def __init__(self, alpha: float = 0.5, beta: float = 0.1, max_prediction_time: float = 1.0):
+        """
+        Create an AlphaBetaPoseFilter
+        :param alpha: Gain for the pose correction, between 0 (ignore measurements) and 1 (no smoothing)
+        :param beta: Gain for the velocity correction, between 0 and 1
+        :param max_prediction_time: Maximum time in seconds the pose is extrapolated after the last measurement. When a
+        marker is not measured for longer, the filter restarts from its next measurement
+        """
+        self.alpha = alpha
+        self.beta = beta
+        self.max_prediction_time = max_prediction_time
+
+        # State vectors are (x, y, angle)
+        self.state: Optional[np.ndarray] = None
+        self.velocity = np.zeros(3)
+        self.timestamp = 0.
+
+    def reset(self) -> None:
+        """
+        Forget the current estimate. The next measurement will be used as is
+        :return: None
+        """
+        self.state = None
+        self.velocity = np.zeros(3)
+
+    def update(self, pose: Pose) -> Pose:
+        """
+        Correct the estimate with a new measurement
+        :param pose: The measured pose. When it has no timestamp, the current time is used
+        :return: The filtered pose
+        """
+        timestamp = pose.timestamp if pose.timestamp is not None else time.time()
+        measurement = np.array([pose.position[0], pose.position[1], pose.angle], dtype=np.float64)
+
+        dt = timestamp - self.timestamp
+        if self.state is None or dt > self.max_prediction_time:
+            # After a long gap, the velocity says nothing about where the marker is now
+            self.state = measurement
+            self.velocity = np.zeros(3)
+            self.timestamp = timestamp
+            return self._to_pose(self.state, timestamp)
+
+        if dt <= 0:
+            return self._to_pose(self.state, self.timestamp)
+
+        predicted = self.state + self.velocity * dt
+        residual = measurement - predicted
+        residual[2] = (residual[2] + 180) % 360 - 180
+
+        self.state = predicted + self.alpha * residual
+        self.state[2] %= 360
+        self.velocity = self.velocity + (self.beta / dt) * residual
+        self.timestamp = timestamp
+        return self._to_pose(self.state, timestamp)
+
+    def predict(self, timestamp: float) -> Optional[Pose]:
+        """
+        Predict the pose at a given time
+        :param timestamp: Time to predict the pose for
+        :return: The predicted pose, or None when no measurement was received yet
+        """
+        if self.state is None:
+            return None
+        dt = min(max(timestamp - self.timestamp, 0.), self.max_prediction_time)
+        predicted = self.state + self.velocity * dt
+        predicted[2] %= 360
+        return self._to_pose(predicted, timestamp)
+
+    @staticmethod
+    def _to_pose(state: np.ndarray, timestamp: float) -> Pose:
+        return Pose((float(state[0]), float(state[1])), float(state[2]), timestamp)
@@ -0,0 +1,109 @@
+#
+# Copyright (c) 2021. Niels Post. AI Lab Vrije Universiteit Brussel.
+#
+# This file is part of MP-Firm.
+#
+# MP-Firm is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MP-Firm is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MP-Firm.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+from functools import partial
+from typing import Dict, Optional
+
+from warehouse_pmsv_tracker.detection.aruco import ArucoID
+from warehouse_pmsv_tracker.detection.PoseListenerRegistry import PoseListenerRegistry, PoseListener
+from warehouse_pmsv_tracker.util.shape import Pose
+
+from .AlphaBetaPoseFilter import AlphaBetaPoseFilter
+
+
+class PoseFilterBank(PoseListenerRegistry):
+    """
+    Filtering layer between the pose listeners of a detection pipeline and their consumers.
+
+    The filter bank keeps an AlphaBetaPoseFilter per marker. It offers the same listener interface as the detection
+    pipeline, so consumers (such as Robot) can listen to the filter bank instead of the pipeline, and receive smoothed
+    poses. The filtered pose of any marker can also be predicted for an arbitrary time.
+    """
+
+    def __init__(self, detection_pipeline, alpha: float = 0.5, beta: float = 0.1, max_prediction_time: float = 1.0):
+        """
+        Create a PoseFilterBank
+        :param detection_pipeline: Pipeline (or any object with add_pose_listener/remove_pose_listener) to filter
+        :param alpha: Gain for the pose correction of each filter
+        :param beta: Gain for the velocity correction of each filter
+        :param max_prediction_time: Maximum time in seconds a pose is extrapolated after its last measurement
+        """
+        super().__init__()
+        self.detection_pipeline = detection_pipeline
+        self.alpha = alpha
+        self.beta = beta
+        self.max_prediction_time = max_prediction_time
+
+        self.filters: Dict[ArucoID, AlphaBetaPoseFilter] = dict()
+        self._pipeline_listeners: Dict[ArucoID, PoseListener] = dict()
+
+    def _on_pose(self, aruco_id: ArucoID, pose: Pose):
+        if aruco_id not in self.filters:
+            self.filters[aruco_id] = AlphaBetaPoseFilter(self.alpha, self.beta, self.max_prediction_time)
+        self._call_pose_listeners(aruco_id, self.filters[aruco_id].update(pose))
+
+    def add_pose_listener(self, aruco_id: ArucoID, listener: PoseListener):
+        """
+        Start listening to the filtered pose of a specific Aruco Marker
+        :param aruco_id: ID to start listening for
+        :param listener: Listener to call with each filtered pose
+        :return: None
+        """
+        if aruco_id not in self._pipeline_listeners:
+            self._pipeline_listeners[aruco_id] = partial(self._on_pose, aruco_id)
+            self.detection_pipeline.add_pose_listener(aruco_id, self._pipeline_listeners[aruco_id])
+        super().add_pose_listener(aruco_id, listener)
+
+    def remove_pose_listeners_for_id(self, aruco_id: ArucoID):
+        """
+        Clear all pose listeners for a specific Aruco Marker ID, and stop filtering its poses
+        :param aruco_id: The ID to clear listeners for
+        :return: None
+        """
+        super().remove_pose_listeners_for_id(aruco_id)
+        self._release_unused(aruco_id)
+
+    def remove_pose_listener(self, aruco_id: ArucoID, listener: PoseListener):
+        """
+        Stop calling a specific pose listener. The poses of a marker are no longer filtered once its last listener is
+        removed
+        :param aruco_id: ID the pose listener is registered to
+        :param listener: The specific listener
+        :return: None
+        """
+        super().remove_pose_listener(aruco_id, listener)
+        self._release_unused(aruco_id)
+
+    def _release_unused(self, aruco_id: ArucoID):
+        if aruco_id in self._pipeline_listeners and not self.pose_listeners.get(aruco_id):
+            self.detection_pipeline.remove_pose_listener(aruco_id, self._pipeline_listeners.pop(aruco_id))
+            self.pose_listeners.pop(aruco_id, None)
+            self.filters.pop(aruco_id, None)
+
+    def predict(self, aruco_id: ArucoID, timestamp: float) -> Optional[Pose]:
+        """
+        Predict the pose of a marker at a given time
+        :param aruco_id: ID of the marker
+        :param timestamp: Time to predict the pose for
+        :return: The predicted pose, or None if the marker was never seen
+        """
+        if aruco_id not in self.filters:
+            return None
+        return self.filters[aruco_id].predict(timestamp)
@@ -0,0 +1,45 @@
+#
+# Copyright (c) 2021. Niels Post. AI Lab Vrije Universiteit Brussel.
+#
+# This file is part of MP-Firm.
+#
+# MP-Firm is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MP-Firm is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MP-Firm.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+from typing import NamedTuple, Union, Optional
+
+from warehouse_pmsv_tracker.detection.aruco import ArucoQuad
+from warehouse_pmsv_tracker.util.shape import Rectangle
+
+
+class CameraConfiguration(NamedTuple):
+    """
+    Configuration of one camera of a multi camera setup.
+
+    Each camera has its own test area, marked by its own four corner markers. The area is mapped to a rectangle in the
+    shared world coordinates, so all cameras report poses in the same coordinate system. The areas of neighbouring
+    cameras should overlap a little, so robots can be handed off between cameras.
+    """
+    # Device index or video path, as passed to cv2.VideoCapture in the camera's process
+    capture_device: Union[int, str]
+    calibration_file: str
+    testarea_corners: ArucoQuad
+    # Part of the world rectangle covered by the test area of this camera
+    area: Rectangle
+    area_file: Optional[str] = None
+    detection_scale: float = 1.
+    aruco_parameter_file: Optional[str] = None
+    aruco_dictionary_file: Optional[str] = None
+    undistortion_cache_directory: Optional[str] = None
@@ -0,0 +1,289 @@
+#
+# Copyright (c) 2021. Niels Post. AI Lab Vrije Universiteit Brussel.
+#
+# This file is part of MP-Firm.
+#
+# MP-Firm is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MP-Firm is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MP-Firm.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+import multiprocessing
+import queue
+import threading
+import time
+from typing import List, Dict, Optional, NamedTuple, FrozenSet, Set
+
+import cv2
+import numpy as np
+
+from warehouse_pmsv_tracker.detection import ArucoDetectionPipeline, NewMarkerListener, FramePoseListenerRegistry
+from warehouse_pmsv_tracker.detection.aruco import ArucoID
+from warehouse_pmsv_tracker.util.metrics import default_registry
+from warehouse_pmsv_tracker.util.shape import Pose, Rectangle
+
+from .CameraConfiguration import CameraConfiguration
+
+
+class _CameraPoses(NamedTuple):
+    """
+    Poses of all markers one camera saw in a frame, sent from the camera's process to the main process
+    """
+    camera_index: int
+    frame_number: int
+    timestamp: float
+    poses: Dict[ArucoID, Pose]
+    # Time in seconds the camera spent detecting markers in the frame
+    detection_duration: float
+
+
+class _MarkerOwner(NamedTuple):
+    """
+    The camera whose poses are currently used for a marker
+    """
+    camera_index: int
+    last_seen: float
+
+
+def _camera_worker(camera_index: int, configuration: CameraConfiguration, ignored_ids: FrozenSet[ArucoID],
+                   detection_rate, pose_queue: multiprocessing.Queue, preview_queue: Optional[multiprocessing.Queue],
+                   preview_rate: float, preview_scale: float, stop_event):
+    """
+    Main loop of a camera process. Runs a complete detection pipeline, and sends the poses of each frame to the main
+    process
+    """
+    pipeline = ArucoDetectionPipeline(cv2.VideoCapture(configuration.capture_device),
+                                      configuration.calibration_file,
+                                      configuration.testarea_corners,
+                                      configuration.area,
+                                      area_file=configuration.area_file,
+                                      detection_scale=configuration.detection_scale,
+                                      aruco_parameter_file=configuration.aruco_parameter_file,
+                                      aruco_dictionary_file=configuration.aruco_dictionary_file,
+                                      undistortion_cache_directory=configuration.undistortion_cache_directory)
+
+    def on_frame_poses(poses: Dict[ArucoID, Pose], timestamp: float):
+        pose_queue.put(_CameraPoses(camera_index, pipeline.frame_number, timestamp,
+                                    {marker_id: pose for marker_id, pose in poses.items()
+                                     if marker_id not in ignored_ids},
+                                    pipeline.last_detection_duration))
+
+    pipeline.add_frame_pose_listener(on_frame_poses)
+
+    next_preview = 0.
+    try:
+        while not stop_event.is_set():
+            started = time.time()
+            try:
+                pipeline.process_next_frame()
+            except Exception as e:
+                print("Camera %i: %s" % (camera_index, e))
+
+            if preview_queue is not None and started >= next_preview:
+                next_preview = started + 1. / preview_rate
+                image = pipeline.get_annotated_image()
+                if image is not None:
+                    try:
+                        preview_queue.put_nowait((camera_index, cv2.resize(image, None, fx=preview_scale,
+                                                                           fy=preview_scale)))
+                    except queue.Full:
+                        pass
+
+            delay = 1. / detection_rate.value - (time.time() - started)
+            if delay > 0:
+                time.sleep(delay)
+    finally:
+        pipeline.release()
+
+
+def _inside_distance(rect: Rectangle, position) -> float:
+    """
+    Distance from a position to the nearest edge of a rectangle. Negative when the position is outside of it
+    """
+    x, y = position
+    return min(x - rect.x, rect.x + rect.w - x, y - rect.y, rect.y + rect.h - y)
+
+
+class MultiCameraPipeline(FramePoseListenerRegistry):
+    """
+    Covers a larger test area with several cameras, each running its own ArucoDetectionPipeline in its own process.
+
+    Every camera maps its part of the floor into the shared world coordinates. The main process merges the poses of
+    all cameras into one stream: each marker is owned by one camera at a time, and only the poses of its owner are
+    used. A marker is handed off to another camera when that camera sees it further inside its own area than the
+    current owner by at least the hand-off margin, or when the owner has not seen it for the hand-off timeout. The
+    margin keeps markers in the overlap zone from switching back and forth between cameras.
+
+    MultiCameraPipeline offers the same listener interface as ArucoDetectionPipeline, so it can be used in its place.
+    """
+
+    def __init__(self, cameras: List[CameraConfiguration], world_size: Rectangle,
+                 newmarker_listener: NewMarkerListener = lambda marker: None, detection_rate: float = 30.,
+                 handoff_margin: float = 50., handoff_timeout: float = 0.5, preview_rate: float = 5.,
+                 preview_scale: float = 0.5):
+        """
+        Create a multi camera pipeline and start the camera processes
+        :param cameras: Configuration of each camera
+        :param world_size: The actual size of the complete test area in millimeters
+        :param newmarker_listener: Called when a new marker is found by any camera
+        :param detection_rate: Maximum amount of frames processed per second, per camera
+        :param handoff_margin: How much further (in millimeters) inside its own area another camera needs to see a
+        marker, before the marker is handed off to that camera
+        :param handoff_timeout: Time in seconds after which a marker is handed off to any camera that sees it, when its
+        owner lost it
+        :param preview_rate: Amount of annotated preview frames per second each camera sends, 0 to disable previews
+        :param preview_scale: Scale of the preview frames, relative to the camera resolution
+        """
+        super().__init__()
+        self.cameras = cameras
+        self.world_size = world_size
+        self.newmarker_listener = newmarker_listener
+        self.handoff_margin = handoff_margin
+        self.handoff_timeout = handoff_timeout
+
+        self.frame_timestamp = 0.
+        self.frame_number = 0
+        self.tracking: Set[ArucoID] = set()
+        self.camera_frame_numbers: List[int] = [0] * len(cameras)
+
+        self._owners: Dict[ArucoID, _MarkerOwner] = dict()
+        # Previews are added by the control loop, and read by the stream thread
+        self._previews: Dict[int, np.ndarray] = dict()
+        self._preview_lock = threading.Lock()
+
+        # Corner markers of one camera may be visible to another camera, they should never be seen as robots
+        ignored_ids = frozenset(marker_id for camera in cameras for marker_id in camera.testarea_corners)
+
+        self._detection_rate = multiprocessing.Value('d', detection_rate)
+        self._stop_event = multiprocessing.Event()
+        self._pose_queue = multiprocessing.Queue()
+        self._preview_queue = multiprocessing.Queue(2 * len(cameras)) if preview_rate > 0 else None
+        self._processes = [
+            multiprocessing.Process(target=_camera_worker,
+                                    args=(index, camera, ignored_ids, self._detection_rate, self._pose_queue,
+                                          self._preview_queue, preview_rate, preview_scale, self._stop_event),
+                                    name="Camera-%i" % index,
+                                    daemon=True)
+            for index, camera in enumerate(cameras)
+        ]
+        for process in self._processes:
+            process.start()
+
+    @property
+    def detection_rate(self) -> float:
+        """
+        Maximum amount of frames processed per second, per camera
+        """
+        return self._detection_rate.value
+
+    @detection_rate.setter
+    def detection_rate(self, rate: float):
+        self._detection_rate.value = rate
+
+    def is_area_detected(self) -> bool:
+        """
+        Check if every camera found its test area
+        :return: True when poses were received from all cameras
+        """
+        return all(frame_number > 0 for frame_number in self.camera_frame_numbers)
+
+    def process_next_frame(self):
+        """
+        Merge all poses the cameras sent since the last call, and call the pose listeners.
+
+        Never blocks: the cameras process frames in their own processes.
+        :return:
+        """
+        while True:
+            try:
+                camera_poses: _CameraPoses = self._pose_queue.get_nowait()
+            except queue.Empty:
+                break
+            self._merge(camera_poses)
+
+        if self._preview_queue is not None:
+            while True:
+                try:
+                    camera_index, image = self._preview_queue.get_nowait()
+                except queue.Empty:
+                    break
+                with self._preview_lock:
+                    self._previews[camera_index] = image
+
+    def _is_owner(self, camera_index: int, aruco_id: ArucoID, pose: Pose) -> bool:
+        owner = self._owners.get(aruco_id)
+        if owner is not None and owner.camera_index != camera_index \
+                and pose.timestamp - owner.last_seen < self.handoff_timeout:
+            own_distance = _inside_distance(self.cameras[camera_index].area, pose.position)
+            owner_distance = _inside_distance(self.cameras[owner.camera_index].area, pose.position)
+            if own_distance < owner_distance + self.handoff_margin:
+                return False
+
+        self._owners[aruco_id] = _MarkerOwner(camera_index, pose.timestamp)
+        return True
+
+    def _merge(self, camera_poses: _CameraPoses):
+        self.camera_frame_numbers[camera_poses.camera_index] = camera_poses.frame_number
+        self.frame_timestamp = camera_poses.timestamp
+        self.frame_number += 1
+        # The camera processes have their own metrics, so their detection time is recorded here
+        default_registry.record("detect", camera_poses.detection_duration)
+
+        owned_poses = {marker_id: pose for marker_id, pose in camera_poses.poses.items()
+                       if self._is_owner(camera_poses.camera_index, marker_id, pose)}
+
+        new_ids = [marker_id for marker_id in owned_poses if marker_id not in self.tracking]
+        dispatched_poses = {marker_id: pose for marker_id, pose in owned_poses.items() if marker_id in self.tracking}
+
+        for marker_id, pose in dispatched_poses.items():
+            self._call_pose_listeners(marker_id, pose)
+        self._call_frame_pose_listeners(dispatched_poses, camera_poses.timestamp)
+
+        for marker_id in new_ids:
+            self.newmarker_listener(marker_id)
+            self.tracking.add(marker_id)
+
+    def get_annotated_image(self) -> Optional[np.ndarray]:
+        """
+        Create an image showing the latest annotated preview of every camera, side by side
+        :return: The combined image, or None if no previews were received yet
+        """
+        with self._preview_lock:
+            previews = [preview for _, preview in sorted(self._previews.items())]
+        if not previews:
+            return None
+        height = min(preview.shape[0] for preview in previews)
+        return np.hstack([cv2.resize(preview, (preview.shape[1] * height // preview.shape[0], height))
+                          for preview in previews])
+
+    def untrack(self, id: ArucoID):
+        """
+        Stop tracking a marker.
+
+        When the marker is detected again by any camera, the newmarker_listener will be called.
+        :param id: ID of the marker to stop tracking
+        :return:
+        """
+        self.tracking.discard(id)
+        self._owners.pop(id, None)
+
+    def release(self):
+        """
+        Stop all camera processes
+        :return:
+        """
+        self._stop_event.set()
+        for process in self._processes:
+            process.join(5)
+            if process.is_alive():
+                process.terminate()
@@ -0,0 +1,232 @@
+#
+# Copyright (c) 2021. Niels Post. AI Lab Vrije Universiteit Brussel.
+#
+# This file is part of MP-Firm.
+#
+# MP-Firm is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MP-Firm is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MP-Firm.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+import multiprocessing
+import os
+import queue
+import time
+from multiprocessing.shared_memory import SharedMemory
+from typing import NamedTuple, List, Dict, Tuple, Optional
+
+import numpy as np
+from cv2 import aruco
+
+from warehouse_pmsv_tracker.detection.aruco import Aruco, ArucoDetectionResult
+
+
+class DetectionWorkResult(NamedTuple):
+    """
+    Detection result for a single frame processed by the worker pool
+    """
+    frame_number: int
+    timestamp: float
+    detection_result: ArucoDetectionResult
+    # Time in seconds the worker spent detecting markers in the frame
+    detection_duration: float
+    # Description of the exception raised by the worker, None when detection succeeded
+    error: Optional[str] = None
+
+
+def _detection_worker(slot_names: List[str], shape: Tuple[int, ...], dtype: str, aruco_dict_id: int,
+                      detection_scale: float, parameter_file: Optional[str], dictionary_file: Optional[str],
+                      task_queue: multiprocessing.Queue, result_queue: multiprocessing.Queue):
+    """
+    Main loop of a worker process. Runs Aruco detection on frames placed in shared memory slots.
+
+    A failing frame is reported back as an error result, so the pool never waits for a result that will not come.
+    """
+    detector = Aruco(aruco_dict_id, detection_scale, parameter_file=parameter_file, dictionary_file=dictionary_file)
+    slots = [SharedMemory(name=name) for name in slot_names]
+    images = [np.ndarray(shape, dtype=dtype, buffer=slot.buf) for slot in slots]
+
+    try:
+        while True:
+            task = task_queue.get()
+            if task is None:
+                break
+            sequence, slot_index = task
+            started = time.perf_counter()
+            try:
+                result = detector.process(images[slot_index])
+            except Exception as e:
+                result_queue.put((sequence, slot_index, None, None, time.perf_counter() - started, repr(e)))
+                continue
+            result_queue.put((sequence, slot_index, result.corners, result.ids, time.perf_counter() - started, None))
+    finally:
+        del images
+        for slot in slots:
+            slot.close()
+
+
+class DetectionWorkerPool:
+    """
+    Pool of worker processes that run Aruco detection in parallel.
+
+    Frames are copied into a fixed set of shared memory slots, so only a slot index travels through the task queue.
+    Workers may finish frames out of order, so results are re-sequenced before they are handed out. This guarantees
+    that results are always returned in the same order the frames were submitted.
+
+    Frames that fail in a worker are returned as results without markers and with the error set. When a worker
+    process stops unexpectedly, waiting for results raises a RuntimeError instead of blocking forever.
+    """
+
+    # Seconds to wait for a result before checking that all workers are still running
+    LIVENESS_CHECK_INTERVAL = 1.
+
+    def __init__(self, frame_shape: Tuple[int, ...], frame_dtype=np.uint8, num_workers: Optional[int] = None,
+                 aruco_dict_id=aruco.DICT_ARUCO_ORIGINAL, slots_per_worker: int = 2, detection_scale: float = 1.,
+                 parameter_file: Optional[str] = None, dictionary_file: Optional[str] = None):
+        """
+        Create a worker pool and start its processes
+        :param frame_shape: Shape of the frames that will be submitted
+        :param frame_dtype: Datatype of the frames that will be submitted
+        :param num_workers: Amount of worker processes, defaults to the amount of CPU cores
+        :param aruco_dict_id: Which Aruco Dictionary the workers detect
+        :param slots_per_worker: Amount of frames that can be in flight per worker
+        :param detection_scale: Scale the workers detect markers at, see Aruco
+        :param parameter_file: Aruco parameter profile the workers load, see Aruco
+        :param dictionary_file: Marker dictionary the workers detect instead of aruco_dict_id, see Aruco
+        """
+        self.frame_shape = tuple(frame_shape)
+        self.frame_dtype = np.dtype(frame_dtype)
+        self.num_workers = num_workers if num_workers is not None else os.cpu_count() or 1
+
+        frame_size = int(np.prod(self.frame_shape)) * self.frame_dtype.itemsize
+        self._slots = [SharedMemory(create=True, size=frame_size)
+                       for _ in range(self.num_workers * slots_per_worker)]
+        self._slot_images = [np.ndarray(self.frame_shape, dtype=self.frame_dtype, buffer=slot.buf)
+                             for slot in self._slots]
+        self._free_slots = list(range(len(self._slots)))
+
+        self._task_queue = multiprocessing.Queue()
+        self._result_queue = multiprocessing.Queue()
+
+        self._submitted_frames: Dict[int, Tuple[int, float]] = dict()
+        self._finished_results: Dict[int, DetectionWorkResult] = dict()
+        self._next_submit_sequence = 0
+        self._next_result_sequence = 0
+
+        self._workers = [
+            multiprocessing.Process(target=_detection_worker,
+                                    args=([slot.name for slot in self._slots], self.frame_shape,
+                                          self.frame_dtype.str, aruco_dict_id, detection_scale, parameter_file,
+                                          dictionary_file, self._task_queue, self._result_queue),
+                                    name="DetectionWorker-%i" % i,
+                                    daemon=True)
+            for i in range(self.num_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    @property
+    def frames_in_flight(self) -> int:
+        """
+        Amount of frames that were submitted, but not yet returned by get_results
+        """
+        return self._next_submit_sequence - self._next_result_sequence
+
+    def submit(self, image: np.ndarray, frame_number: int, timestamp: float) -> None:
+        """
+        Submit a frame for detection.
+
+        When all shared memory slots are in use, this blocks until a worker finishes a frame.
+        :param image: The frame to detect markers in
+        :param frame_number: Number of the frame, returned with the result
+        :param timestamp: Capture time of the frame, returned with the result
+        :return: None
+        """
+        if image.shape != self.frame_shape:
+            raise ValueError("Frame of shape %s submitted to a pool for shape %s" % (image.shape, self.frame_shape))
+
+        while not self._free_slots:
+            self._collect(True)
+
+        slot_index = self._free_slots.pop()
+        np.copyto(self._slot_images[slot_index], image)
+
+        sequence = self._next_submit_sequence
+        self._next_submit_sequence += 1
+        self._submitted_frames[sequence] = (frame_number, timestamp)
+        self._task_queue.put((sequence, slot_index))
+
+    def _collect(self, block: bool) -> bool:
+        while True:
+            try:
+                sequence, slot_index, corners, ids, detection_duration, error = \
+                    self._result_queue.get(block, self.LIVENESS_CHECK_INTERVAL)
+                break
+            except queue.Empty:
+                if not block:
+                    return False
+                self._check_workers()
+
+        self._free_slots.append(slot_index)
+        frame_number, timestamp = self._submitted_frames.pop(sequence)
+        if error is None:
+            detection_result = ArucoDetectionResult(corners, ids)
+        else:
+            detection_result = ArucoDetectionResult.from_aruco([], None)
+        self._finished_results[sequence] = DetectionWorkResult(frame_number, timestamp, detection_result,
+                                                               detection_duration, error)
+        return True
+
+    def _check_workers(self) -> None:
+        for worker in self._workers:
+            if not worker.is_alive():
+                raise RuntimeError("Detection worker %s stopped unexpectedly with exit code %s, %i frames are lost"
+                                   % (worker.name, worker.exitcode, len(self._submitted_frames)))
+
+    def get_results(self, block: bool = False) -> List[DetectionWorkResult]:
+        """
+        Retrieve all finished results that are next in submission order
+        :param block: When True, wait until at least the oldest submitted frame is finished
+        :return: Finished results, ordered by submission
+        """
+        while self._collect(False):
+            pass
+
+        if block:
+            while self._next_submit_sequence > self._next_result_sequence \
+                    and self._next_result_sequence not in self._finished_results:
+                self._collect(True)
+
+        results = []
+        while self._next_result_sequence in self._finished_results:
+            results.append(self._finished_results.pop(self._next_result_sequence))
+            self._next_result_sequence += 1
+        return results
+
+    def close(self) -> None:
+        """
+        Stop all workers and free the shared memory slots
+        :return: None
+        """
+        for _ in self._workers:
+            self._task_queue.put(None)
+        for worker in self._workers:
+            worker.join(1)
+            if worker.is_alive():
+                worker.terminate()
+
+        del self._slot_images
+        for slot in self._slots:
+            slot.close()
+            slot.unlink()
+        self._slots = []
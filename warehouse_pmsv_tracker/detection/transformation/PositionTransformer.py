@@ -18,29 +18,50 @@
 #
 
 
+import os
+from typing import Optional
+
+import cv2
+import numpy as np
+
 from warehouse_pmsv_tracker.util.shape import Quadrilateral, Rectangle, Point
 
 class PositionTransformer:
     """
     Map positions within a quadrilateral to a rectangle
+
+    The mapping is a perspective transformation, which is calculated once when the transformer is created. Any amount
+    of points can then be transformed with a single matrix multiplication.
     """
 
     def __init__(self, quad: Quadrilateral, rect: Rectangle):
         self.quad = quad
         self.rect = rect
 
+        source = np.array([quad.topleft, quad.topright, quad.bottomleft, quad.bottomright], dtype=np.float32)
+        destination = np.array([rect.get_xy_from_uv(u, v) for u, v in ((0, 0), (1, 0), (0, 1), (1, 1))],
+                               dtype=np.float32)
+        self.perspective_matrix: np.ndarray = cv2.getPerspectiveTransform(source, destination)
+
+    def transform_points(self, points: np.ndarray) -> np.ndarray:
+        """
+        Transform an array of points to positions in the rectangle
+        :param points: Array of points in any shape (..., 2), for example (N, 2) or (N, 4, 2)
+        :return: Array of transformed points, in the same shape as points
+        """
+        points = np.asarray(points, dtype=np.float64)
+        flat = points.reshape(-1, 2)
+        transformed = flat @ self.perspective_matrix[:, :2].T + self.perspective_matrix[:, 2]
+        return (transformed[:, :2] / transformed[:, 2:]).reshape(points.shape)
+
     def get_transformed_position(self, p: Point) -> Point:
         """
         Transform a single position to a position in the quadrilateral
         :param p:
         :return:
         """
-        h_distances = self.quad.get_minimum_horizontal_distances(p)
-        u_coordinate = h_distances[0] / sum(h_distances)
-        v_distances = self.quad.get_minimum_vertical_distances(p)
-        v_coordinate = v_distances[0] / sum(v_distances)
-
-        return self.rect.get_xy_from_uv(u_coordinate, v_coordinate)
+        x, y = self.transform_points(p)
+        return x, y
 
     def get_transformed_quad(self, quad: Quadrilateral) -> Quadrilateral:
         """
@@ -48,6 +69,51 @@ class PositionTransformer:
         :param quad: Quad to transform
         :return: A new quad with all transformed positions
         """
-        return Quadrilateral(
-            *[self.get_transformed_position(p) for p in quad.coordinates]
-        )
+        return Quadrilateral(*self.transform_points(quad.get_contour()))
+
+    def get_max_corner_distance(self, quad: Quadrilateral) -> float:
+        """
+        Calculate how far the corners of another quadrilateral are from the corners of this transformer's quadrilateral
+        :param quad: Quadrilateral to compare with
+        :return: The largest distance between two corresponding corners
+        """
+        return float(np.linalg.norm(quad.get_contour() - self.quad.get_contour(), axis=1).max())
+
+    def save(self, file: str) -> None:
+        """
+        Store the quadrilateral, rectangle and perspective matrix of the transformer in a file.
+
+        The file is written to a temporary file first, and then moved into place, so a reader never sees a partial file
+        :param file: Path of the (.yaml) file to write
+        :return: None
+        """
+        root, extension = os.path.splitext(file)
+        temporary_file = root + ".tmp" + extension
+        fs = cv2.FileStorage(temporary_file, cv2.FILE_STORAGE_WRITE)
+        fs.write("area_quad", np.asarray(self.quad.get_contour(), dtype=np.float64))
+        fs.write("area_rectangle", np.array([self.rect.x, self.rect.y, self.rect.w, self.rect.h], dtype=np.float64))
+        fs.write("perspective_matrix", self.perspective_matrix)
+        fs.release()
+        os.replace(temporary_file, file)
+
+    @classmethod
+    def load(cls, file: str, rect: Optional[Rectangle] = None) -> Optional['PositionTransformer']:
+        """
+        Load a transformer stored with save
+        :param file: Path of the file to read
+        :param rect: Rectangle to map to. When None, the rectangle stored in the file is used
+        :return: The loaded transformer, or None if the file does not exist or is invalid
+        """
+        if not os.path.isfile(file):
+            return None
+
+        fs = cv2.FileStorage(file, cv2.FILE_STORAGE_READ)
+        quad = fs.getNode("area_quad").mat()
+        stored_rect = fs.getNode("area_rectangle").mat()
+        fs.release()
+        if quad is None or quad.shape != (4, 2) or stored_rect is None:
+            return None
+
+        if rect is None:
+            rect = Rectangle(*stored_rect.flatten().tolist())
+        return cls(Quadrilateral(*[tuple(point) for point in quad.tolist()]), rect)
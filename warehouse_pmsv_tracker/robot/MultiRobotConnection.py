@@ -18,6 +18,7 @@
 #
 
 
+import threading
 import time
 from enum import IntEnum
 from typing import Callable, Optional, NewType, List, Dict, Tuple
@@ -27,6 +28,7 @@ from spidev import SpiDev
 
 from warehouse_pmsv_tracker.robot.command import Response, Command
 from warehouse_pmsv_tracker.robot.lib import NRF24
+from warehouse_pmsv_tracker.util.metrics import default_registry
 
 
 class RobotAlreadyRegisteredError(RuntimeError):
@@ -95,6 +97,7 @@ class MultiRobotConnection:
         :param broadcast_read_pipe:  Pipe to read broadcast responses from (make sure the last byte is always FF)
         """
         self.current_message_id = 0
+        self._radio_lock = threading.RLock()
         self.broadcast_write_pipe = broadcast_write_pipe
         self.broadcast_read_pipe = broadcast_read_pipe
         self._init_NRF(channel, csn_pin, ce_pin)
@@ -138,12 +141,13 @@ class MultiRobotConnection:
         :param errorCallback: Function to be called when no robot responds within the allowed time
         :return:
         """
-        self.radio.stopListening()
-        self.radio.openWritingPipe(self.broadcast_write_pipe)
-        self.radio.write(cmd.to_bytes(self.current_message_id))
-        self.radio.startListening()
-        self.sent_commands[self.current_message_id] = _SentCommand(callback, cmd, errorCallback)
-        self._increment_message_id()
+        with self._radio_lock:
+            self.radio.stopListening()
+            self.radio.openWritingPipe(self.broadcast_write_pipe)
+            self.radio.write(cmd.to_bytes(self.current_message_id))
+            self.radio.startListening()
+            self.sent_commands[self.current_message_id] = _SentCommand(callback, cmd, errorCallback)
+            self._increment_message_id()
 
     def clear_callback(self, message_id) -> bool:
         if message_id in self.sent_commands:
@@ -166,17 +170,18 @@ class MultiRobotConnection:
         if not robot_id in self.robots:
             raise UnknownRobotError(robot_id)
 
-        self.radio.stopListening()
-        self.radio.setAutoAckPipe(0, True)
-        self.radio.openWritingPipe(self.robots[robot_id][0])
-        success = self.radio.write(cmd.to_bytes(self.current_message_id))
-        self.radio.setAutoAckPipe(0, False)
+        with self._radio_lock:
+            self.radio.stopListening()
+            self.radio.setAutoAckPipe(0, True)
+            self.radio.openWritingPipe(self.robots[robot_id][0])
+            success = self.radio.write(cmd.to_bytes(self.current_message_id))
+            self.radio.setAutoAckPipe(0, False)
 
-        self.radio.startListening()
-        if not success and errorCallback is not None:
-            errorCallback(self.current_message_id)
-        self.sent_commands[self.current_message_id] = _SentCommand(callback, cmd, errorCallback)
-        self._increment_message_id()
+            self.radio.startListening()
+            if not success and errorCallback is not None:
+                errorCallback(self.current_message_id)
+            self.sent_commands[self.current_message_id] = _SentCommand(callback, cmd, errorCallback)
+            self._increment_message_id()
 
     def process_incoming_data(self):
         """
@@ -188,25 +193,26 @@ class MultiRobotConnection:
         :return:
         """
 
-        pipe = [0]
-        if self.radio.available(pipe):
-            payload = []
-            length = self.radio.getDynamicPayloadSize()
-            self.radio.read(payload, length)
-            msg = Response(payload)
+        with self._radio_lock, default_registry.time("radio_poll"):
+            pipe = [0]
+            if self.radio.available(pipe):
+                payload = []
+                length = self.radio.getDynamicPayloadSize()
+                self.radio.read(payload, length)
+                msg = Response(payload)
 
-            if msg.message_id in self.sent_commands:
-                if self.sent_commands[msg.message_id].update(msg):
-                    del self.sent_commands[msg.message_id]
-        keys = []
+                if msg.message_id in self.sent_commands:
+                    if self.sent_commands[msg.message_id].update(msg):
+                        del self.sent_commands[msg.message_id]
+            keys = []
 
-        for sent_command_id in list(self.sent_commands.keys()):
-            if sent_command_id in self.sent_commands:
-                if self.sent_commands[sent_command_id].is_expired():
-                    keys.append(sent_command_id)
+            for sent_command_id in list(self.sent_commands.keys()):
+                if sent_command_id in self.sent_commands:
+                    if self.sent_commands[sent_command_id].is_expired():
+                        keys.append(sent_command_id)
 
-        for key in keys:
-            self.sent_commands.pop(key, "None")
+            for key in keys:
+                self.sent_commands.pop(key, "None")
 
     def register_robot(self, id: int):
         """
@@ -217,11 +223,12 @@ class MultiRobotConnection:
         if id in self.robots:
             raise RobotAlreadyRegisteredError(id)
 
-        self.robots[id] = (
-            [*self.broadcast_write_pipe[:-1], id],
-            [*self.broadcast_read_pipe[:-1], id]
-        )
-        self.radio.openReadingPipe(len(self.robots) - 1, self.robots[id][1])
+        with self._radio_lock:
+            self.robots[id] = (
+                [*self.broadcast_write_pipe[:-1], id],
+                [*self.broadcast_read_pipe[:-1], id]
+            )
+            self.radio.openReadingPipe(len(self.robots) - 1, self.robots[id][1])
 
     def is_registered(self, id: int):
         """
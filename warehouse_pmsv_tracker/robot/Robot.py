@@ -23,11 +23,12 @@ from typing import Optional, Union
 
 from warehouse_pmsv_tracker.detection import ArucoDetectionPipeline
 from warehouse_pmsv_tracker.detection.aruco import ArucoID
+from warehouse_pmsv_tracker.detection.filter import PoseFilterBank
 from warehouse_pmsv_tracker.robot import MultiRobotConnection, CommandCallback, ErrorCallback
 from warehouse_pmsv_tracker.robot.command import Response, Command, ReturnCode
 from warehouse_pmsv_tracker.robot.command.factory import ActionCommandFactory
 from warehouse_pmsv_tracker.robot.command.registry import Category
-from warehouse_pmsv_tracker.util.shape import Pose, Point
+from warehouse_pmsv_tracker.util.shape import Pose, Point, PoseHistory
 
 
 class RobotState(IntEnum):
@@ -61,16 +62,22 @@ def _logged_response(resp: Response):
 
 class Robot:
     def __init__(self, id: ArucoID, multi_robot_connection: MultiRobotConnection,
-                 detection_pipeline: Optional[ArucoDetectionPipeline]):
+                 detection_pipeline: Optional[ArucoDetectionPipeline], pose_filter: Optional[PoseFilterBank] = None,
+                 pose_history_size: int = 3000):
         """
         Initialize (connect to) a robot
         :param id: ID of the robot
         :param multi_robot_connection: Multi robot connection to attach the robot to
         :param detection_pipeline: Detection pipeline to use for position tracking
+        :param pose_filter: When given, the robot receives filtered poses from this filter bank instead of raw poses
+        from the detection pipeline
+        :param pose_history_size: Amount of poses to keep in the pose history of the robot
         """
         self.id = id
         self.current_pose: Pose = Pose(Point((0., 0.)), 0)
-        self.pipeline: ArucoDetectionPipeline = detection_pipeline
+        self.pose_history = PoseHistory(pose_history_size)
+        self.pose_filter = pose_filter
+        self.pipeline = pose_filter if pose_filter is not None else detection_pipeline
         self.multi_robot_connection = multi_robot_connection
         self.detection_pipeline = detection_pipeline
 
@@ -79,8 +86,8 @@ class Robot:
         self.logged_messages = []
         self.current_state: RobotState = RobotState.IDLE
 
-        if self.detection_pipeline is not None:
-            self.detection_pipeline.add_pose_listener(self.id, self._set_pose)
+        if self.pipeline is not None:
+            self.pipeline.add_pose_listener(self.id, self._set_pose)
 
     def __del__(self):
         """
@@ -132,6 +139,21 @@ class Robot:
 
     def _set_pose(self, new_pose: Pose):
         self.current_pose = new_pose
+        self.pose_history.append(new_pose)
+
+    def predict_pose(self, timestamp: float) -> Pose:
+        """
+        Predict the pose of the robot at a given time.
+
+        Without a pose filter, this returns the last detected pose
+        :param timestamp: Time (as returned by time.time()) to predict the pose for
+        :return: The predicted pose
+        """
+        if self.pose_filter is not None:
+            predicted_pose = self.pose_filter.predict(self.id, timestamp)
+            if predicted_pose is not None:
+                return predicted_pose
+        return self.current_pose
 
     def _assert_connection(self):
         if self.multi_robot_connection is None or not self.multi_robot_connection.is_registered(self.id):
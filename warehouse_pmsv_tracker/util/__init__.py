@@ -21,4 +21,5 @@
 from .Assertion import is_bool_compatible, is_unsigned_compatible
 from .ConfigValueInformation import ConfigValueInformation
 from . import shape
-__all__ = ["is_bool_compatible", "is_unsigned_compatible", "shape", "ConfigValueInformation"]
+from . import metrics
+__all__ = ["is_bool_compatible", "is_unsigned_compatible", "shape", "metrics", "ConfigValueInformation"]
@@ -0,0 +1,117 @@
+#
+# Copyright (c) 2021. Niels Post. AI Lab Vrije Universiteit Brussel.
+#
+# This file is part of MP-Firm.
+#
+# MP-Firm is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MP-Firm is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MP-Firm.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+import threading
+import time
+from typing import Dict
+
+from .RollingHistogram import RollingHistogram
+
+
+class _StageTimer:
+    """
+    Context manager that records the time spent inside it into a histogram. The recorded duration stays available as
+    its duration attribute
+    """
+    __slots__ = ("histogram", "start", "duration")
+
+    def __init__(self, histogram: RollingHistogram):
+        self.histogram = histogram
+        self.start = 0.
+        self.duration = 0.
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.duration = time.perf_counter() - self.start
+        self.histogram.record(self.duration)
+
+
+class MetricsRegistry:
+    """
+    Collection of rolling duration histograms, one for each named stage.
+
+    Stages are timed by wrapping them in registry.time(stage_name). The histograms can be exported in the Prometheus
+    text format, as a summary with p50, p95 and p99 quantiles per stage.
+    """
+
+    QUANTILES = (0.5, 0.95, 0.99)
+
+    def __init__(self, window: int = 1024):
+        """
+        Create an empty registry
+        :param window: Amount of most recent durations per stage to calculate quantiles over
+        """
+        self.window = window
+        self.histograms: Dict[str, RollingHistogram] = dict()
+        self._lock = threading.Lock()
+
+    def get_histogram(self, stage: str) -> RollingHistogram:
+        """
+        Get the histogram of a stage, creating it when it does not exist yet
+        :param stage: Name of the stage
+        :return: The histogram
+        """
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(stage, RollingHistogram(self.window))
+        return histogram
+
+    def time(self, stage: str) -> _StageTimer:
+        """
+        Time a stage. Use as: with registry.time("detect"): ...
+        :param stage: Name of the stage
+        :return: Context manager recording its duration in seconds
+        """
+        return _StageTimer(self.get_histogram(stage))
+
+    def record(self, stage: str, duration: float) -> None:
+        """
+        Record a duration that was measured elsewhere
+        :param stage: Name of the stage
+        :param duration: Duration in seconds
+        :return: None
+        """
+        self.get_histogram(stage).record(duration)
+
+    def to_prometheus(self, metric_name: str = "pmsv_stage_duration_seconds") -> str:
+        """
+        Export all histograms in the Prometheus text exposition format
+        :param metric_name: Name of the exported summary metric
+        :return: The exposition text
+        """
+        lines = ["# HELP %s Duration of each processing stage, over the last %d runs" % (metric_name, self.window),
+                 "# TYPE %s summary" % metric_name]
+        with self._lock:
+            histograms = sorted(self.histograms.items())
+        for stage, histogram in histograms:
+            percentiles = histogram.percentiles(q * 100 for q in self.QUANTILES)
+            for quantile, value in zip(self.QUANTILES, percentiles):
+                lines.append('%s{stage="%s",quantile="%s"} %.9g' % (metric_name, stage, quantile, value))
+            lines.append('%s_sum{stage="%s"} %.9g' % (metric_name, stage, histogram.total))
+            lines.append('%s_count{stage="%s"} %d' % (metric_name, stage, histogram.count))
+        return "\n".join(lines) + "\n"
+
+
+# Registry used by all pipeline stages
+default_registry = MetricsRegistry()
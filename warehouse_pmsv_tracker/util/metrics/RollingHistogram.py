@@ -0,0 +1,68 @@
+#
+# Copyright (c) 2021. Niels Post. AI Lab Vrije Universiteit Brussel.
+#
+# This file is part of MP-Firm.
+#
+# MP-Firm is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MP-Firm is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MP-Firm.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+import threading
+from typing import Iterable, List
+
+import numpy as np
+
+
+class RollingHistogram:
+    """
+    Keeps the most recent values of a measurement, to calculate percentiles over a rolling window.
+
+    Recording a value only stores it in a fixed size ring buffer. Sorting happens when percentiles are requested, so
+    the cost of a measurement stays constant, no matter how often it is taken.
+    """
+
+    def __init__(self, window: int = 1024):
+        """
+        Create an empty histogram
+        :param window: Amount of most recent values to calculate percentiles over
+        """
+        self.window = window
+        self.count = 0
+        self.total = 0.
+        self._values = np.zeros(window, dtype=np.float64)
+        self._lock = threading.Lock()
+
+    def record(self, value: float) -> None:
+        """
+        Add a value to the histogram
+        :param value: The measured value
+        :return: None
+        """
+        with self._lock:
+            self._values[self.count % self.window] = value
+            self.count += 1
+            self.total += value
+
+    def percentiles(self, percentiles: Iterable[float]) -> List[float]:
+        """
+        Calculate percentiles of the values in the window
+        :param percentiles: Percentiles to calculate, between 0 and 100
+        :return: The value at each percentile, or NaN for each percentile when nothing was recorded yet
+        """
+        percentiles = list(percentiles)
+        with self._lock:
+            values = self._values[:min(self.count, self.window)].copy()
+        if len(values) == 0:
+            return [float("nan")] * len(percentiles)
+        return np.percentile(values, percentiles).tolist()
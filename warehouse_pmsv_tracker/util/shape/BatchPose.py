@@ -0,0 +1,58 @@
+#
+# Copyright (c) 2021. Niels Post. AI Lab Vrije Universiteit Brussel.
+#
+# This file is part of MP-Firm.
+#
+# MP-Firm is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MP-Firm is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MP-Firm.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+from typing import Tuple
+
+import numpy as np
+
+
+def calculate_batch_centroids(corners: np.ndarray) -> np.ndarray:
+    """
+    Find the centroids of a batch of quadrilaterals
+    :param corners: Array of shape (N, 4, 2), containing the corners of each quadrilateral
+    :return: Array of shape (N, 2) with the centroid of each quadrilateral
+    """
+    return np.asarray(corners).mean(axis=1)
+
+
+def calculate_batch_directions(corners: np.ndarray) -> np.ndarray:
+    """
+    Calculate the direction of a batch of quadrilaterals, from the center of the bottom edge to the center of the top
+    edge. This is the vectorised equivalent of calculate_direction_to_point.
+    :param corners: Array of shape (N, 4, 2), containing the corners of each quadrilateral in topleft, topright,
+    bottomleft, bottomright order
+    :return: Array of shape (N,) with the direction of each quadrilateral in degrees, between 0 and 360
+    """
+    corners = np.asarray(corners)
+    direction = (corners[:, 0] + corners[:, 1]) - (corners[:, 2] + corners[:, 3])
+    return np.degrees(np.arctan2(direction[:, 1], direction[:, 0])) % 360
+
+
+def calculate_batch_poses(corners: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Calculate the poses of a batch of quadrilaterals in one pass.
+
+    This gives the same result as calling Quadrilateral.get_pose for each quadrilateral.
+    :param corners: Array of shape (N, 4, 2), containing the corners of each quadrilateral in topleft, topright,
+    bottomleft, bottomright order
+    :return: Three arrays of shape (N,): the x coordinates, y coordinates and angles of the poses
+    """
+    centroids = calculate_batch_centroids(corners)
+    return centroids[:, 0], centroids[:, 1], calculate_batch_directions(corners)
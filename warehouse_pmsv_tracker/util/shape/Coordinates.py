@@ -74,3 +74,14 @@ def calculate_points_centroid(points: List[Point]) -> Point:
     x_coordinates: List[float] = [coord[0] for coord in points]
     y_coordinates: List[float] = [coord[1] for coord in points]
     return Point((sum(x_coordinates) / len(x_coordinates), sum(y_coordinates) / len(y_coordinates)))
+
+
+def calculate_rescaled_pixel_points(points: np.ndarray, scale: float) -> np.ndarray:
+    """
+    Map pixel coordinates found in an image resized by a factor back to the original image
+    :param points: Array of points in the resized image
+    :param scale: Factor the image was resized by
+    :return: float32 array of the same shape with the points in the original image
+    """
+    # Pixel centers are at +0.5, so scale around those instead of around the pixel edges
+    return ((points + .5) / scale - .5).astype(np.float32)
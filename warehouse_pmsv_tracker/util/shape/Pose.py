@@ -18,6 +18,8 @@
 #
 
 
+from typing import Optional
+
 import numpy as np
 import cv2
 
@@ -28,9 +30,16 @@ class Pose:
         Object to store information about a Pose (Position + Angle)
     """
 
-    def __init__(self, position: Point, angle: float):
+    def __init__(self, position: Point, angle: float, timestamp: Optional[float] = None):
+        """
+        Create a Pose
+        :param position: Position of the pose
+        :param angle: Angle of the pose in degrees
+        :param timestamp: Time (as returned by time.time()) at which the pose was observed, if known
+        """
         self.position = position
         self.angle = angle
+        self.timestamp = timestamp
 
     """
     Draw the pose to an image
@@ -54,7 +63,7 @@ class Pose:
 
     def __sub__(self, other):
         pos = (self.position[0] - other.position[0], self.position[1] - other.position[1])
-        return Pose(pos, self.angle - other.angle)
+        return Pose(pos, self.angle - other.angle, self.timestamp)
 
     def __repr__(self):
         return "Pose(" + str(self.position) + "," + str(self.angle) + ")"
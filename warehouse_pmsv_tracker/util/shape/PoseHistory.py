@@ -0,0 +1,162 @@
+#
+# Copyright (c) 2021. Niels Post. AI Lab Vrije Universiteit Brussel.
+#
+# This file is part of MP-Firm.
+#
+# MP-Firm is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MP-Firm is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MP-Firm.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+import threading
+from typing import Optional, List
+
+import numpy as np
+
+from .Pose import Pose
+
+
+class PoseHistory:
+    """
+    Fixed capacity history of the poses of one marker.
+
+    Poses are stored as (timestamp, x, y, angle) rows in a NumPy ring buffer. When the buffer is full, the oldest pose
+    is overwritten, so memory use stays the same no matter how long the system runs.
+
+    Because poses are appended in chronological order, the buffer consists of (at most) two sorted segments. Time
+    lookups use a binary search on these segments, so they take O(log n).
+    """
+
+    def __init__(self, capacity: int = 3000):
+        """
+        Create an empty pose history
+        :param capacity: Maximum amount of poses to keep
+        """
+        if capacity < 1:
+            raise ValueError("Pose history capacity should be at least 1")
+        self.capacity = capacity
+        self._data = np.zeros((capacity, 4), dtype=np.float64)
+        self._start = 0
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    def append(self, pose: Pose) -> bool:
+        """
+        Add a pose to the history.
+
+        Poses without a timestamp, or with a timestamp older than the newest pose in the history, are ignored.
+        :param pose: The pose to add
+        :return: True if the pose was added
+        """
+        if pose.timestamp is None:
+            return False
+
+        with self._lock:
+            if self._size > 0 and pose.timestamp < self._data[(self._start + self._size - 1) % self.capacity, 0]:
+                return False
+
+            if self._size < self.capacity:
+                row = (self._start + self._size) % self.capacity
+                self._size += 1
+            else:
+                row = self._start
+                self._start = (self._start + 1) % self.capacity
+
+            self._data[row] = (pose.timestamp, pose.position[0], pose.position[1], pose.angle)
+            return True
+
+    def clear(self):
+        """
+        Remove all poses from the history
+        :return: None
+        """
+        with self._lock:
+            self._start = 0
+            self._size = 0
+
+    def _segments(self):
+        end = self._start + self._size
+        return self._data[self._start:min(end, self.capacity)], self._data[:max(0, end - self.capacity)]
+
+    def _search(self, timestamp: float, side: str) -> int:
+        """
+        Find the logical index at which a timestamp would be inserted, keeping the history sorted
+        :param timestamp: Timestamp to search for
+        :param side: 'left' or 'right', as in np.searchsorted
+        :return: Index between 0 and len(self)
+        """
+        first, second = self._segments()
+        index = int(np.searchsorted(first[:, 0], timestamp, side))
+        if index < len(first) or len(second) == 0:
+            return index
+        return len(first) + int(np.searchsorted(second[:, 0], timestamp, side))
+
+    def _rows(self, begin: int, end: int) -> np.ndarray:
+        indices = (self._start + np.arange(begin, end)) % self.capacity
+        return self._data[indices]
+
+    def get_range(self, start_time: Optional[float] = None, end_time: Optional[float] = None) -> np.ndarray:
+        """
+        Retrieve all poses between two timestamps (inclusive)
+        :param start_time: Start of the range, or None to start at the oldest pose
+        :param end_time: End of the range, or None to end at the newest pose
+        :return: Array of shape (N, 4) with (timestamp, x, y, angle) rows, in chronological order
+        """
+        with self._lock:
+            begin = 0 if start_time is None else self._search(start_time, 'left')
+            end = self._size if end_time is None else self._search(end_time, 'right')
+            return self._rows(begin, max(begin, end))
+
+    def get_poses(self, start_time: Optional[float] = None, end_time: Optional[float] = None) -> List[Pose]:
+        """
+        Retrieve all poses between two timestamps (inclusive), as Pose objects
+        :param start_time: Start of the range, or None to start at the oldest pose
+        :param end_time: End of the range, or None to end at the newest pose
+        :return: List of poses, in chronological order
+        """
+        return [Pose((x, y), angle, timestamp)
+                for timestamp, x, y, angle in self.get_range(start_time, end_time).tolist()]
+
+    def get_pose_at(self, timestamp: float) -> Optional[Pose]:
+        """
+        Find the pose at a given time, interpolating between the two surrounding poses.
+
+        The angle is interpolated over the shortest direction, so interpolating between 350 and 10 degrees passes 0.
+        :param timestamp: Time to find the pose for
+        :return: The interpolated pose, or None if the timestamp is outside of the history
+        """
+        with self._lock:
+            if self._size == 0:
+                return None
+
+            index = self._search(timestamp, 'left')
+            if index == self._size:
+                return None
+
+            after = self._rows(index, index + 1)[0]
+            if after[0] == timestamp:
+                return Pose((float(after[1]), float(after[2])), float(after[3]), timestamp)
+            if index == 0:
+                return None
+
+            before = self._rows(index - 1, index)[0]
+
+        fraction = (timestamp - before[0]) / (after[0] - before[0])
+        x, y = before[1:3] + (after[1:3] - before[1:3]) * fraction
+        angle_difference = (after[3] - before[3] + 180) % 360 - 180
+        angle = (before[3] + angle_difference * fraction) % 360
+
+        return Pose((float(x), float(y)), float(angle), timestamp)
@@ -21,7 +21,9 @@
 from .Pose import Pose
 from .Quadrilateral import Quadrilateral
 from .Rectangle import Rectangle
-from .Coordinates import Point, Line, calculate_direction_to_point, calculate_shortest_distance, calculate_point_distance, calculate_points_centroid
+from .Coordinates import Point, Line, calculate_direction_to_point, calculate_shortest_distance, calculate_point_distance, calculate_points_centroid, calculate_rescaled_pixel_points
+from .BatchPose import calculate_batch_centroids, calculate_batch_directions, calculate_batch_poses
+from .PoseHistory import PoseHistory
 
 
-__all__ = ["Point", "Line", "Pose", "Quadrilateral", "Rectangle", "calculate_direction_to_point", "calculate_shortest_distance", "calculate_point_distance", "calculate_points_centroid"]
+__all__ = ["Point", "Line", "Pose", "PoseHistory", "Quadrilateral", "Rectangle", "calculate_direction_to_point", "calculate_shortest_distance", "calculate_point_distance", "calculate_points_centroid", "calculate_rescaled_pixel_points", "calculate_batch_centroids", "calculate_batch_directions", "calculate_batch_poses"]
@@ -0,0 +1,163 @@
+#
+# Copyright (c) 2021. Niels Post. AI Lab Vrije Universiteit Brussel.
+#
+# This file is part of MP-Firm.
+#
+# MP-Firm is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MP-Firm is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MP-Firm.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _PeriodicTask:
+    def __init__(self, name: str, callback: Callable[[], None], rate: float):
+        self.name = name
+        self.callback = callback
+        self.period = 1. / rate
+        self.next_deadline = 0.
+
+        self.runs = 0
+        self.deadline_misses = 0
+        self.errors = 0
+        self.total_duration = 0.
+        self.max_duration = 0.
+
+    def get_statistics(self) -> Dict[str, float]:
+        return {
+            "rate": 1. / self.period,
+            "runs": self.runs,
+            "deadline_misses": self.deadline_misses,
+            "errors": self.errors,
+            "average_duration": self.total_duration / self.runs if self.runs else 0.,
+            "max_duration": self.max_duration
+        }
+
+
+class ControlLoop:
+    """
+    Runs a set of periodic tasks at fixed rates on a single thread.
+
+    Tasks run in order of their deadline. When a task is still running at its next deadline, this is counted as a
+    deadline miss, and the task is rescheduled one period after it finished instead of trying to catch up.
+
+    An exception raised by a task is logged and counted in its statistics, after which the loop continues. A single
+    failure, like a camera frame that could not be captured, should not stop all other tasks.
+    """
+
+    def __init__(self, name: str = "ControlLoop"):
+        """
+        Create a ControlLoop
+        :param name: Name of the thread running the loop
+        """
+        self.name = name
+        self.tasks: List[_PeriodicTask] = []
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    def add_task(self, name: str, callback: Callable[[], None], rate: float) -> None:
+        """
+        Add a periodic task to the loop
+        :param name: Name of the task, used in the statistics
+        :param callback: Function to call each period
+        :param rate: Amount of times per second the callback is called
+        :return: None
+        """
+        self.tasks.append(_PeriodicTask(name, callback, rate))
+
+    def set_rate(self, name: str, rate: float) -> None:
+        """
+        Change the rate of a task
+        :param name: Name of the task
+        :param rate: New amount of times per second the callback is called
+        :return: None
+        """
+        for task in self.tasks:
+            if task.name == name:
+                task.period = 1. / rate
+
+    def start(self) -> None:
+        """
+        Start running the loop on its own thread
+        :return: None
+        """
+        if self._thread is not None:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop the loop after the currently running task finishes
+        :return: None
+        """
+        self._running = False
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    @property
+    def is_running(self) -> bool:
+        """
+        True while the loop thread is running
+        """
+        return self._running
+
+    def get_statistics(self) -> Dict[str, Dict[str, float]]:
+        """
+        Get the run and deadline miss statistics of all tasks
+        :return: A dictionary with the statistics per task name
+        """
+        return {task.name: task.get_statistics() for task in self.tasks}
+
+    def _run(self):
+        try:
+            self._run_tasks()
+        finally:
+            self._running = False
+
+    def _run_tasks(self):
+        start = time.time()
+        for task in self.tasks:
+            task.next_deadline = start
+
+        while self._running and self.tasks:
+            task = min(self.tasks, key=lambda t: t.next_deadline)
+
+            delay = task.next_deadline - time.time()
+            if delay > 0:
+                time.sleep(delay)
+
+            started = time.time()
+            try:
+                task.callback()
+            except Exception:
+                task.errors += 1
+                logger.exception("Task %s of %s failed", task.name, self.name)
+            finished = time.time()
+
+            task.runs += 1
+            task.total_duration += finished - started
+            task.max_duration = max(task.max_duration, finished - started)
+
+            task.next_deadline += task.period
+            if finished > task.next_deadline:
+                task.deadline_misses += 1
+                task.next_deadline = finished + task.period
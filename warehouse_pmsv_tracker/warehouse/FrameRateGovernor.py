@@ -0,0 +1,106 @@
+#
+# Copyright (c) 2021. Niels Post. AI Lab Vrije Universiteit Brussel.
+#
+# This file is part of MP-Firm.
+#
+# MP-Firm is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MP-Firm is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MP-Firm.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+import time
+from typing import Optional
+
+
+class FrameRateGovernor:
+    """
+    Decides when the next camera frame should be processed.
+
+    While robots are active, frames are processed at the active rate. When no activity was reported for idle_delay
+    seconds, the target rate drops to the idle rate, saving CPU time (and power) while nothing moves. As soon as new
+    activity is reported, the governor returns to the active rate.
+    """
+
+    def __init__(self, active_rate: float = 30., idle_rate: float = 2., idle_delay: float = 2.,
+                 smoothing: float = 0.1):
+        """
+        Create a FrameRateGovernor
+        :param active_rate: Target frame rate in frames per second while robots are active
+        :param idle_rate: Target frame rate in frames per second while all robots are idle
+        :param idle_delay: Time in seconds without activity before switching to the idle rate
+        :param smoothing: Weight of the newest frame interval in the measured frame rate
+        """
+        self.active_rate = active_rate
+        self.idle_rate = idle_rate
+        self.idle_delay = idle_delay
+        self.smoothing = smoothing
+
+        self.actual_rate = 0.
+        self._last_activity = time.time()
+        self._last_frame: Optional[float] = None
+
+    def notify_activity(self, now: Optional[float] = None) -> None:
+        """
+        Report robot activity, such as a sent command or a newly detected marker
+        :param now: Current time, defaults to time.time()
+        :return: None
+        """
+        self._last_activity = now if now is not None else time.time()
+
+    def is_idle(self, now: Optional[float] = None) -> bool:
+        """
+        Check if the governor is running at the idle rate
+        :param now: Current time, defaults to time.time()
+        :return: True if no activity was reported in the last idle_delay seconds
+        """
+        now = now if now is not None else time.time()
+        return now - self._last_activity > self.idle_delay
+
+    @property
+    def target_rate(self) -> float:
+        """
+        The frame rate the governor currently aims for
+        """
+        return self.idle_rate if self.is_idle() else self.active_rate
+
+    def time_until_next_frame(self, now: Optional[float] = None) -> float:
+        """
+        Calculate how long it takes until the next frame is due
+        :param now: Current time, defaults to time.time()
+        :return: Time in seconds, 0 if a frame is due now
+        """
+        if self._last_frame is None:
+            return 0.
+        now = now if now is not None else time.time()
+        rate = self.idle_rate if self.is_idle(now) else self.active_rate
+        return max(0., self._last_frame + 1. / rate - now)
+
+    def is_frame_due(self, now: Optional[float] = None) -> bool:
+        """
+        Check if the next frame should be processed
+        :param now: Current time, defaults to time.time()
+        :return: True if a frame should be processed now
+        """
+        return self.time_until_next_frame(now) == 0.
+
+    def frame_processed(self, now: Optional[float] = None) -> None:
+        """
+        Report that a frame was processed
+        :param now: Current time, defaults to time.time()
+        :return: None
+        """
+        now = now if now is not None else time.time()
+        if self._last_frame is not None and now > self._last_frame:
+            rate = 1. / (now - self._last_frame)
+            self.actual_rate += self.smoothing * (rate - self.actual_rate)
+        self._last_frame = now
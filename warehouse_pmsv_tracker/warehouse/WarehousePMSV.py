@@ -18,35 +18,114 @@
 #
 
 
-from typing import Dict
+import time
+from typing import Dict, Optional, List, Union
 
 import cv2
 
 from warehouse_pmsv_tracker.detection import ArucoDetectionPipeline
 from warehouse_pmsv_tracker.detection.aruco import ArucoQuad, ArucoID
-from warehouse_pmsv_tracker.robot import MultiRobotConnection, Robot
+from warehouse_pmsv_tracker.detection.filter import PoseFilterBank
+from warehouse_pmsv_tracker.detection.multicamera import CameraConfiguration, MultiCameraPipeline
+from warehouse_pmsv_tracker.robot import MultiRobotConnection, Robot, RobotState
 from warehouse_pmsv_tracker.robot.command.factory import GeneralCommandFactory
 from warehouse_pmsv_tracker.util.shape import Rectangle
 
+from .ControlLoop import ControlLoop
+from .FrameRateGovernor import FrameRateGovernor
+
 
 class WarehousePMSV:
-    def __init__(self, testarea_corners: ArucoQuad, real_testarea_size: Rectangle):
+    def __init__(self, testarea_corners: ArucoQuad, real_testarea_size: Rectangle, filter_poses: bool = False,
+                 detection_rate: float = 30., radio_rate: float = 100., area_file: Optional[str] = None,
+                 detection_scale: float = 1., aruco_parameter_file: Optional[str] = None,
+                 aruco_dictionary_file: Optional[str] = None, undistortion_cache_directory: Optional[str] = None,
+                 cameras: Optional[List[CameraConfiguration]] = None):
         """
         Create the Warehouse PMSV.
 
+        The PMSV owns two control loops: one processes camera frames, the other polls the radio for incoming wireless
+        data. They run on separate threads, so waiting for or processing a camera frame never delays the radio.
+        Call start to run them.
+
         Fails if the area cannot be found on the cameraview
         :param testarea_corners: Corners of the test area
         :param real_testarea_size: The actual size of the test area in millimeters
+        :param filter_poses: When True, robots receive poses smoothed by a constant velocity filter
+        :param detection_rate: Maximum amount of camera frames processed per second
+        :param radio_rate: Amount of times per second the radio is polled for incoming data
+        :param area_file: File to persist the detected test area in, so it is available immediately after a restart
+        :param detection_scale: Scale markers are detected at before their corners are refined at full resolution.
+        Lower values are faster, but need larger markers in view
+        :param aruco_parameter_file: Aruco detector parameter profile, as written by the ArucoParameterTuner
+        :param aruco_dictionary_file: Marker dictionary containing only the deployed markers, as written by
+        MarkerDictionary. When None, markers from the original Aruco dictionary are detected
+        :param undistortion_cache_directory: Directory to cache the camera undistortion maps in, to speed up restarts
+        :param cameras: When given, the test area is covered by these cameras instead of the single default camera.
+        Each camera runs in its own process, and real_testarea_size is the size of the complete area. The other
+        detection parameters are then taken from the camera configurations
         """
-        self.detection_pipeline = ArucoDetectionPipeline(
-            cv2.VideoCapture(0),
-            "../../resources/cybertrack_h3_calibration.yaml",
-            testarea_corners,
-            real_testarea_size,
-            self.on_new_marker_detected
-        )
+        self.detection_pipeline: Union[ArucoDetectionPipeline, MultiCameraPipeline]
+        if cameras is not None:
+            self.detection_pipeline = MultiCameraPipeline(
+                cameras,
+                real_testarea_size,
+                self.on_new_marker_detected,
+                detection_rate
+            )
+        else:
+            self.detection_pipeline = ArucoDetectionPipeline(
+                cv2.VideoCapture(0),
+                "../../resources/cybertrack_h3_calibration.yaml",
+                testarea_corners,
+                real_testarea_size,
+                self.on_new_marker_detected,
+                area_file=area_file,
+                detection_scale=detection_scale,
+                aruco_parameter_file=aruco_parameter_file,
+                aruco_dictionary_file=aruco_dictionary_file,
+                undistortion_cache_directory=undistortion_cache_directory
+            )
+        self.pose_filter = PoseFilterBank(self.detection_pipeline) if filter_poses else None
         self.robotConnection = MultiRobotConnection()
         self.robots: Dict[int, Robot] = dict()
+        self.frame_rate_governor = FrameRateGovernor(detection_rate)
+
+        self.control_loop = ControlLoop("PMSVDetectionLoop")
+        self.control_loop.add_task("detection", self.update_detection, detection_rate)
+        self.radio_loop = ControlLoop("PMSVRadioLoop")
+        self.radio_loop.add_task("radio", self.robotConnection.process_incoming_data, radio_rate)
+        self._detection_rate = detection_rate
+
+    def start(self):
+        """
+        Start the control loops, which keep updating the PMSV on their own threads
+        :return:
+        """
+        self.control_loop.start()
+        self.radio_loop.start()
+
+    def stop(self):
+        """
+        Stop the control loops
+        :return:
+        """
+        self.control_loop.stop()
+        self.radio_loop.stop()
+
+    @property
+    def is_running(self) -> bool:
+        """
+        True while both control loops are running
+        """
+        return self.control_loop.is_running and self.radio_loop.is_running
+
+    def get_loop_statistics(self) -> Dict[str, Dict[str, float]]:
+        """
+        Get the run and deadline miss statistics of the tasks of both control loops
+        :return: A dictionary with the statistics per task name
+        """
+        return {**self.control_loop.get_statistics(), **self.radio_loop.get_statistics()}
 
     def robot_added(self, id):
         """
@@ -54,7 +133,7 @@ class WarehousePMSV:
         :param id: Id that the robot responded for
         :return:
         """
-        robot = Robot(id, self.robotConnection, self.detection_pipeline)
+        robot = Robot(id, self.robotConnection, self.detection_pipeline, self.pose_filter)
         self.robots[id] = robot
 
     def on_new_marker_detected(self, id: ArucoID):
@@ -65,14 +144,48 @@ class WarehousePMSV:
         :param id: ID that was detected
         :return:
         """
+        self.frame_rate_governor.notify_activity()
         self.robotConnection.broadcast_command(GeneralCommandFactory.set_id(id),
                                                lambda msg: self.robot_added(id),
                                                lambda msg_id: self.detection_pipeline.untrack(id))
 
+    def update_detection(self):
+        """
+        Checks for updates in the position of the aruco_markers markers
+
+        The frame rate governor sets the rate of the detection task, which is lowered while no robot is working or
+        waiting for a command.
+        :return:
+        """
+        now = time.time()
+        # Robots are added by the radio loop, so iterate over a copy
+        if any(robot.current_state in (RobotState.WORKING, RobotState.COMMAND_SENT)
+               for robot in list(self.robots.values())):
+            self.frame_rate_governor.notify_activity(now)
+
+        target_rate = self.frame_rate_governor.target_rate
+        if target_rate != self._detection_rate:
+            self._detection_rate = target_rate
+            self.control_loop.set_rate("detection", target_rate)
+
+        if isinstance(self.detection_pipeline, MultiCameraPipeline):
+            # The cameras process frames in their own processes, only their frame rate is governed here
+            self.detection_pipeline.detection_rate = target_rate
+            merged_frame_number = self.detection_pipeline.frame_number
+            self.detection_pipeline.process_next_frame()
+            if self.detection_pipeline.frame_number != merged_frame_number:
+                self.frame_rate_governor.frame_processed(now)
+            return
+
+        self.detection_pipeline.process_next_frame()
+        self.frame_rate_governor.frame_processed(now)
+
     def update(self):
         """
         Checks for incoming messages, and for updates in the position of the aruco_markers markers
+
+        This performs one iteration of the control loops manually, and should not be used while the control loops run
         :return:
         """
-        self.detection_pipeline.process_next_frame()
+        self.update_detection()
         self.robotConnection.process_incoming_data()
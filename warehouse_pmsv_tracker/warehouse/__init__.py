@@ -18,4 +18,6 @@
 #
 
 
+from .ControlLoop import ControlLoop
+from .FrameRateGovernor import FrameRateGovernor
 from .WarehousePMSV import WarehousePMSV
\ No newline at end of file